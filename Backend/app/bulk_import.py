@@ -0,0 +1,223 @@
+"""Bulk-load sweets from CSV or NDJSON in batches.
+
+Used by ``POST /api/sweets/import`` and from the command line:
+
+    python -m app.bulk_import catalog.csv --batch-size 5000 --update-existing
+"""
+import argparse
+import csv
+import io
+import json
+import logging
+import time
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import facets, models, schemas
+from app.db import engine
+
+logger = logging.getLogger(__name__)
+
+MAX_REPORTED_ERRORS = 100
+COLUMNS = ("name", "category", "price", "quantity")
+
+
+def read_rows(text_file, fmt: str):
+    """Yield ``(line_number, row_dict)`` pairs; bad lines yield an exception instead."""
+    if fmt == "csv":
+        reader = csv.DictReader(text_file)
+        for row in reader:
+            yield reader.line_num, row
+        return
+
+    for line_number, line in enumerate(text_file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield line_number, e
+            continue
+        yield line_number, row if isinstance(row, dict) else ValueError("Expected a JSON object")
+
+
+def _error_message(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+
+def _copy_batch(conn, rows, locked_ids) -> list[tuple[int, str, int | None]]:
+    # COPY into a temp table, then upsert from it in one statement
+    buf = io.StringIO()
+    csv.writer(buf).writerows([row[c] for c in COLUMNS] for row in rows)
+    buf.seek(0)
+
+    cursor = conn.connection.dbapi_connection.cursor()
+    cursor.execute(
+        "CREATE TEMP TABLE IF NOT EXISTS sweets_import "
+        "(name text, category text, price double precision, quantity integer) ON COMMIT DELETE ROWS"
+    )
+    cursor.copy_expert(f"COPY sweets_import ({', '.join(COLUMNS)}) FROM STDIN WITH (FORMAT csv)", buf)
+    conflict = (
+        "DO UPDATE SET category = EXCLUDED.category, price = EXCLUDED.price, quantity = EXCLUDED.quantity, "
+        "version = sweets.version + 1 WHERE sweets.id = ANY(%(locked)s)"
+        if locked_ids is not None
+        else "DO NOTHING"
+    )
+    cursor.execute(
+        f"INSERT INTO sweets ({', '.join(COLUMNS)}) SELECT {', '.join(COLUMNS)} FROM sweets_import "
+        f"ON CONFLICT (name) {conflict} RETURNING id, name, quantity",
+        {"locked": list(locked_ids or ())},
+    )
+    return cursor.fetchall()
+
+
+def _insert_batch(conn, rows, locked_ids) -> list[tuple[int, str, int | None]]:
+    dialect = conn.dialect.name
+    table = models.Sweet.__table__
+    if dialect not in ("postgresql", "sqlite"):
+        # No upsert: any existing name fails the whole batch, so every row is new
+        conn.execute(table.insert(), rows)
+        return [(row.id, row.name, row.quantity) for row in _existing(conn, [row["name"] for row in rows])]
+
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(table)
+    if locked_ids is not None:
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["name"],
+            set_={**{c: stmt.excluded[c] for c in COLUMNS if c != "name"}, "version": table.c.version + 1},
+            where=table.c.id.in_(locked_ids),
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(index_elements=["name"])
+    return [tuple(row) for row in conn.execute(stmt.returning(table.c.id, table.c.name, table.c.quantity), rows)]
+
+
+def _existing(conn, names, lock: bool = False):
+    table = models.Sweet.__table__
+    if lock and conn.dialect.name == "sqlite":
+        # No row locks in SQLite, but any write holds the database write lock until commit
+        conn.execute(update(table).where(table.c.name.in_(names)).values(quantity=table.c.quantity))
+    stmt = select(table.c.id, table.c.name, table.c.quantity).where(table.c.name.in_(names)).order_by(table.c.id)
+    if lock:
+        stmt = stmt.with_for_update()
+    return conn.execute(stmt).all()
+
+
+def _record_movements(conn, before: dict[int, int | None], written, user_id: int | None):
+    # Same ledger rows the single-sweet endpoints write: "initial" for sweets
+    # this batch inserted, "adjustment" where it overwrote the stock of one
+    movements = []
+    for sweet_id, _, quantity in written:
+        if sweet_id not in before:
+            movements.append({"sweet_id": sweet_id, "delta": quantity or 0, "reason": "initial", "user_id": user_id})
+        elif (quantity or 0) != (before[sweet_id] or 0):
+            delta = (quantity or 0) - (before[sweet_id] or 0)
+            movements.append({"sweet_id": sweet_id, "delta": delta, "reason": "adjustment", "user_id": user_id})
+    if movements:
+        conn.execute(insert(models.StockMovement), movements)
+
+
+def write_batch(conn, rows, update_existing: bool = False, user_id: int | None = None) -> int:
+    """Write one batch of validated rows and their ledger rows, returning how many were stored."""
+    # An upsert can't touch the same row twice, last duplicate wins
+    rows = list({row["name"]: row for row in rows}.values())
+    before, locked_ids = {}, None
+    if update_existing:
+        # Locked, so no purchase lands between this read and the overwrite. Only
+        # these rows get overwritten: a name another transaction inserts meanwhile
+        # is skipped, as its stock before the overwrite is unknown
+        existing = _existing(conn, [row["name"] for row in rows], lock=True)
+        before = {row.id: row.quantity for row in existing}
+        locked_ids = list(before)
+    if conn.dialect.name == "postgresql" and conn.dialect.driver == "psycopg2":
+        written = _copy_batch(conn, rows, locked_ids)
+    else:
+        written = _insert_batch(conn, rows, locked_ids)
+    # Ledger rows for exactly the rows the statement wrote, nothing read around it
+    _record_movements(conn, before, written, user_id)
+    return len(written)
+
+
+def import_file(text_file, fmt: str, batch_size: int = 1000, update_existing: bool = False,
+                user_id: int | None = None) -> dict:
+    """Validate rows with SweetCreate and write them ``batch_size`` at a time.
+
+    Each batch commits on its own, so a failure late in a large file keeps
+    the rows already written. A batch the database rejects stops the import;
+    ``failed_at_line`` is then the first line of that batch. Returns a report
+    for schemas.ImportReport.
+    """
+    start = time.perf_counter()
+    total = written = error_count = 0
+    errors = []
+    batch = []
+    batch_line = failed_at_line = None
+
+    def flush() -> bool:
+        nonlocal written, batch_line, failed_at_line
+        try:
+            with engine.begin() as conn:
+                written += write_batch(conn, batch, update_existing, user_id)
+        except Exception:
+            logger.exception("Import stopped by a database error in the batch starting at line %s", batch_line)
+            failed_at_line = batch_line
+            return False
+        batch.clear()
+        batch_line = None
+        return True
+
+    try:
+        for line_number, row in read_rows(text_file, fmt):
+            total += 1
+            try:
+                if isinstance(row, Exception):
+                    raise row
+                batch.append(schemas.SweetCreate(**row).model_dump())
+            except (ValidationError, ValueError, TypeError) as e:
+                error_count += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({"line": line_number, "error": _error_message(e)})
+                continue
+            batch_line = batch_line or line_number
+            if len(batch) >= batch_size and not flush():
+                break
+        else:
+            if batch:
+                flush()
+    finally:
+        if written:
+            # One re-aggregation for the whole load instead of per-row adjustments
+            facets.rebuild_sync(engine)
+
+    seconds = time.perf_counter() - start
+    return {
+        "rows": total,
+        "written": written,
+        "error_count": error_count,
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(total / seconds, 1) if seconds else 0.0,
+        "failed_at_line": failed_at_line,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk-load sweets from a CSV or NDJSON file.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="defaults to the file extension")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--update-existing", action="store_true", help="overwrite sweets with the same name")
+    args = parser.parse_args()
+
+    fmt = args.format or ("csv" if args.path.endswith(".csv") else "ndjson")
+    models.Base.metadata.create_all(bind=engine)
+    with open(args.path, newline="", encoding="utf-8") as f:
+        report = import_file(f, fmt, args.batch_size, args.update_existing)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+import hashlib
+import os
+import time
+
+import orjson
+from fastapi import Response
+
+from app import models, schemas
+from app.cache import TTLCache
+from app.pagination import NEXT_CURSOR_HEADER
+
+CATALOG_CACHE_SIZE = int(os.getenv("CATALOG_CACHE_SIZE", 1024))
+CATALOG_CACHE_BYTES = int(os.getenv("CATALOG_CACHE_BYTES", 32 * 1024 * 1024))
+# Upper bound on staleness for writes made by other worker processes
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 5))
+# Browsers may keep catalog responses but must revalidate them (a cheap 304)
+CATALOG_CACHE_CONTROL = os.getenv("CATALOG_CACHE_CONTROL", "private, no-cache")
+
+# Catalog reads select these as plain rows, in SweetResponse field order, so
+# orjson turns them into the same bytes the response model would produce
+RESPONSE_FIELDS = tuple(schemas.SweetResponse.model_fields)
+RESPONSE_COLUMNS = tuple(getattr(models.Sweet, field) for field in RESPONSE_FIELDS)
+
+# Serialized catalog pages, keyed by (catalog_version, *normalized params)
+page_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, maxbytes=CATALOG_CACHE_BYTES)
+
+catalog_version = 0
+
+
+def bump_catalog_version():
+    """Call after committing any change to sweets so cached pages go stale."""
+    global catalog_version
+    catalog_version += 1
+    page_cache.clear()
+
+
+def lookup(*params, if_none_match: str | None = None, bypass: bool = False):
+    """Return ``(key, response)`` for a catalog read, response is None on a miss.
+
+    The key pins the version seen before querying, so a page read while a
+    write commits is stored under the old version and never served. A hit
+    whose ETag matches ``if_none_match`` comes back as a bare 304.
+
+    ``bypass`` is for clients reading from the primary after a write: a
+    page another client read from a lagging replica may sit under the new
+    version, so they get ``(None, None)`` and a None key stores nothing.
+    """
+    if bypass:
+        return None, None
+    key = (catalog_version, *params)
+    entry = page_cache.get(key)
+    return key, (_to_response(entry, if_none_match) if entry is not None else None)
+
+
+def store(key, rows, next_cursor: str | None = None, if_none_match: str | None = None) -> Response:
+    """Serialize RESPONSE_COLUMNS rows, cache the page and return it."""
+    body = orjson.dumps([row._asdict() for row in rows])
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    # catalog_version is per process, so pages are tagged by content instead
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    return _put(key, body, headers, etag, if_none_match)
+
+
+def store_sweet(key, row, if_none_match: str | None = None) -> Response:
+    """Serialize, cache and return one sweet row (RESPONSE_COLUMNS plus version)."""
+    body = orjson.dumps({field: getattr(row, field) for field in RESPONSE_FIELDS})
+    return _put(key, body, {}, f'"sweet-{row.id}-v{row.version}"', if_none_match)
+
+
+def _put(key, body: bytes, headers: dict, etag: str, if_none_match: str | None) -> Response:
+    entry = (body, {**headers, "ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL})
+    if key is None:
+        return _to_response(entry)
+    page_cache.set(key, entry, expires_at=time.time() + CATALOG_CACHE_TTL, size=len(body))
+    return _to_response(entry, if_none_match)
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored
+    if if_none_match.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+
+
+def _to_response(entry, if_none_match: str | None = None) -> Response:
+    body, headers = entry
+    if if_none_match and etag_matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
@@ -1,9 +1,10 @@
 from fastapi import Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import and_, case, delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models, schemas
-from app.security import get_current_user
-from app.utils import hash_password
+from app.security import CurrentUser, get_current_user
+from app.utils import hash_password_async
 
 # def create_user(db: Session, user: schemas.UserCreate):
 #     hashed_pw = hash_password(user.password)
@@ -17,22 +18,167 @@ from app.utils import hash_password
 #     db.refresh(db_user)
 #     return db_user
 
-def create_user(db: Session, user: schemas.UserCreate, role: str = "user"):
+async def create_user(db: AsyncSession, user: schemas.UserCreate, role: str = "user"):
     db_user = models.User(
         username=user.username,
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=await hash_password_async(user.password),
         role=role
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
 
 
-def get_current_admin(current_user: models.User = Depends(get_current_user)):
+async def get_current_admin(current_user: CurrentUser = Depends(get_current_user)):
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Admins only")
     return current_user
 
+
+SWEET_COLUMNS = (
+    models.Sweet.id,
+    models.Sweet.name,
+    models.Sweet.category,
+    models.Sweet.price,
+    models.Sweet.quantity,
+)
+
+
+async def change_stock(db: AsyncSession, sweet_id: int, delta: int):
+    """Add ``delta`` to a sweet's quantity with one conditional UPDATE.
+
+    Negative deltas only apply while enough stock is left, so concurrent
+    buyers can't oversell. Returns the updated row, or None if the sweet
+    is missing (or sold out). The caller commits.
+    """
+    stmt = (
+        update(models.Sweet)
+        .where(models.Sweet.id == sweet_id)
+        .values(quantity=models.Sweet.quantity + delta, version=models.Sweet.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if delta < 0:
+        stmt = stmt.where(models.Sweet.quantity >= -delta)
+
+    if db.get_bind().dialect.update_returning:
+        return (await db.execute(stmt.returning(*SWEET_COLUMNS))).first()
+
+    # Older SQLite has no RETURNING: the row is still write-locked by our
+    # transaction, so reading it back right after is safe.
+    if (await db.execute(stmt)).rowcount == 0:
+        return None
+    return (await db.execute(select(*SWEET_COLUMNS).where(models.Sweet.id == sweet_id))).first()
+
+
+async def take_stock(db: AsyncSession, sweet_id: int, wanted: int):
+    """Take up to ``wanted`` units of a sweet, as many as are left.
+
+    Returns ``(row, granted)`` with the row after the update, or
+    ``(None, 0)`` once the sweet is missing or sold out. The caller commits.
+    """
+    while True:
+        available = await db.scalar(select(models.Sweet.quantity).where(models.Sweet.id == sweet_id))
+        if not available or available <= 0:
+            return None, 0
+        granted = min(available, wanted)
+        # Guarded like any other decrement, so a concurrent buyer just means another lap
+        row = await change_stock(db, sweet_id, -granted)
+        if row is not None:
+            return row, granted
+
+
+async def checkout_stock(db: AsyncSession, items: dict[int, int]):
+    """Take ``items`` ({sweet_id: quantity}) out of stock all-or-nothing.
+
+    Rows are locked in id order first so concurrent carts can't deadlock,
+    then a single UPDATE decrements every line. Returns the updated rows
+    sorted by id, or None if any sweet is missing or short on stock, in
+    which case the caller must roll back.
+    """
+    ids = sorted(items)
+    await db.execute(
+        select(models.Sweet.id).where(models.Sweet.id.in_(ids)).order_by(models.Sweet.id).with_for_update()
+    )
+
+    amount = case(items, value=models.Sweet.id)
+    stmt = (
+        update(models.Sweet)
+        .where(models.Sweet.id.in_(ids), models.Sweet.quantity >= amount)
+        .values(quantity=models.Sweet.quantity - amount, version=models.Sweet.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+
+    if db.get_bind().dialect.update_returning:
+        rows = (await db.execute(stmt.returning(*SWEET_COLUMNS))).all()
+        if len(rows) != len(ids):
+            return None
+        return sorted(rows, key=lambda row: row.id)
+
+    if (await db.execute(stmt)).rowcount != len(ids):
+        return None
+    return (
+        await db.execute(select(*SWEET_COLUMNS).where(models.Sweet.id.in_(ids)).order_by(models.Sweet.id))
+    ).all()
+
+
+def batch_filter(batch: schemas.BatchFilter):
+    """WHERE clause for the sweets a batch request names."""
+    clauses = []
+    if batch.ids is not None:
+        clauses.append(models.Sweet.id.in_(batch.ids))
+    if batch.category is not None:
+        clauses.append(models.Sweet.category == batch.category)
+    return and_(*clauses)
+
+
+async def lock_where(db: AsyncSession, where):
+    """Lock every sweet matching ``where`` in id order, the order checkout locks in; returns the rows."""
+    return (
+        await db.execute(select(*SWEET_COLUMNS).where(where).order_by(models.Sweet.id).with_for_update())
+    ).all()
+
+
+async def update_where(db: AsyncSession, where, values: dict):
+    """One UPDATE over every sweet matching ``where``; returns the updated rows by id. The caller commits."""
+    stmt = (
+        update(models.Sweet)
+        .where(where)
+        .values(**values, version=models.Sweet.version + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if db.get_bind().dialect.update_returning:
+        return sorted((await db.execute(stmt.returning(*SWEET_COLUMNS))).all(), key=lambda row: row.id)
+
+    # The update may change what ``where`` matches (e.g. the category), so collect ids first
+    ids = (await db.scalars(select(models.Sweet.id).where(where))).all()
+    await db.execute(stmt)
+    return (
+        await db.execute(select(*SWEET_COLUMNS).where(models.Sweet.id.in_(ids)).order_by(models.Sweet.id))
+    ).all()
+
+
+async def delete_where(db: AsyncSession, where):
+    """One DELETE over every sweet matching ``where``; returns the deleted rows by id. The caller commits."""
+    stmt = delete(models.Sweet).where(where).execution_options(synchronize_session=False)
+    if db.get_bind().dialect.delete_returning:
+        return sorted((await db.execute(stmt.returning(*SWEET_COLUMNS))).all(), key=lambda row: row.id)
+
+    rows = (await db.execute(select(*SWEET_COLUMNS).where(where).order_by(models.Sweet.id))).all()
+    await db.execute(stmt)
+    return rows
+
+
+async def record_movements(db: AsyncSession, deltas: dict[int, int], reason: str, user_id: int | None):
+    """Append one ledger row per ``{sweet_id: delta}`` in the current transaction."""
+    if not deltas:
+        return
+    await db.execute(
+        insert(models.StockMovement),
+        [
+            {"sweet_id": sweet_id, "delta": delta, "reason": reason, "user_id": user_id}
+            for sweet_id, delta in sorted(deltas.items())
+        ],
+    )
@@ -1,14 +1,33 @@
+import itertools
 import os
+import time
 
 from dotenv import load_dotenv
+from fastapi import Request
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
+from app.cache import TTLCache
+from app.pool_metrics import pool_options
+from app.query_stats import instrument
+
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+
+def create_pooled_engine(url, is_async: bool = False):
+    """Create an engine with the DB_POOL_* settings, pool metrics and query timing attached."""
+    options = pool_options(is_async)
+    created = (create_async_engine if is_async else create_engine)(url, **options)
+    options["poolclass"].stats.attach(created.sync_engine if is_async else created)
+    instrument(created.sync_engine if is_async else created)
+    return created
+
+
+engine = create_pooled_engine(DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -20,3 +39,84 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ------------------ ASYNC ENGINE ------------------
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url: str):
+    """Swap the sync driver in ``url`` for its asyncio counterpart."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        return url
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+    # asyncpg doesn't understand libpq's sslmode, it takes ssl instead
+    if backend == "postgresql" and "sslmode" in url.query:
+        url = url.difference_update_query(["sslmode"]).update_query_dict({"ssl": url.query["sslmode"]})
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or to_async_url(DATABASE_URL)
+
+async_engine = create_pooled_engine(ASYNC_DATABASE_URL, is_async=True)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# Async dependency used by the routers
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ------------------ READ REPLICAS ------------------
+# Comma-separated replica URLs; reads fall back to the primary when unset
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# How long a client keeps reading from the primary after it wrote
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", 5))
+
+replica_engines = [create_pooled_engine(to_async_url(url), is_async=True) for url in REPLICA_URLS]
+replica_sessions = [
+    async_sessionmaker(replica, autoflush=False, expire_on_commit=False) for replica in replica_engines
+]
+_replica_counter = itertools.count()
+
+# Authorization header -> True while that client must read its own writes
+_sticky_clients = TTLCache(maxsize=100_000)
+
+
+def stick_to_primary(request: Request):
+    client = request.headers.get("authorization")
+    if client:
+        _sticky_clients.set(client, True, expires_at=time.time() + REPLICA_STICKY_SECONDS)
+
+
+def reads_from_primary(request: Request) -> bool:
+    """True when replicas are configured but this client wrote recently."""
+    return bool(replica_sessions) and bool(_sticky_clients.get(request.headers.get("authorization")))
+
+
+def read_sessionmaker(request: Request | None = None):
+    """Round-robin over the replicas, or the primary for recent writers."""
+    if not replica_sessions:
+        return AsyncSessionLocal
+    if request is not None and reads_from_primary(request):
+        return AsyncSessionLocal
+    return replica_sessions[next(_replica_counter) % len(replica_sessions)]
+
+
+# Read-only handlers: may be served by a replica
+async def get_read_db(request: Request):
+    async with read_sessionmaker(request)() as db:
+        yield db
+
+
+# Handlers that write: always the primary, and the caller's next reads stay there too
+async def get_write_db(request: Request):
+    stick_to_primary(request)
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,298 @@
+"""Catalog facets from the ``category_summaries`` table.
+
+Admin writes (create, edit, delete, batch) adjust the summaries of the
+categories they touch inside their own transaction, so reads never aggregate
+over ``sweets``. A category's price range is only recomputed (from that
+category's rows) when a sweet priced at one of its bounds leaves it.
+
+Stock changes from purchases and restocks don't touch the summary rows:
+they append to ``category_stock_deltas``, which ``fold`` moves into the
+summaries every FACETS_FOLD_SECONDS; reads add the pending deltas in.
+Locks are taken sweets rows first (in id order), then summary rows (in
+category order), then deltas.
+"""
+import asyncio
+import logging
+import math
+import os
+
+from sqlalchemy import bindparam, case, delete, func, insert, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+# Seconds between folds of pending stock deltas into the summaries
+FACETS_FOLD_SECONDS = float(os.getenv("FACETS_FOLD_SECONDS", 5))
+
+Summary = models.CategorySummary
+Sweet = models.Sweet
+Delta = models.CategoryStockDelta
+
+
+async def add_sweet(db, category: str, price: float, quantity: int | None):
+    """Count a new sweet (or one moved into ``category``)."""
+    quantity = quantity or 0
+    values = {
+        "category": category,
+        "sweet_count": 1,
+        "total_quantity": quantity,
+        "stock_value": price * quantity,
+        "min_price": price,
+        "max_price": price,
+    }
+    dialect = db.get_bind().dialect.name
+    stmt = (postgresql if dialect == "postgresql" else sqlite).insert(Summary).values(values)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["category"],
+            set_={
+                "sweet_count": Summary.sweet_count + 1,
+                "total_quantity": Summary.total_quantity + quantity,
+                "stock_value": Summary.stock_value + price * quantity,
+                "min_price": case((Summary.min_price <= price, Summary.min_price), else_=price),
+                "max_price": case((Summary.max_price >= price, Summary.max_price), else_=price),
+            },
+        )
+    )
+
+
+async def remove_sweet(db, category: str, price: float, quantity: int | None):
+    """Uncount a sweet; call after the sweets row itself is gone or changed."""
+    quantity = quantity or 0
+    stmt = (
+        update(Summary)
+        .where(Summary.category == category)
+        .values(
+            sweet_count=Summary.sweet_count - 1,
+            total_quantity=Summary.total_quantity - quantity,
+            stock_value=Summary.stock_value - price * quantity,
+        )
+    )
+    columns = (Summary.sweet_count, Summary.min_price, Summary.max_price)
+    if db.get_bind().dialect.update_returning:
+        bounds = (await db.execute(stmt.returning(*columns))).first()
+    else:
+        await db.execute(stmt)
+        bounds = (await db.execute(select(*columns).where(Summary.category == category))).first()
+    if bounds is None:
+        return
+    if bounds.sweet_count <= 0:
+        await db.execute(delete(Summary).where(Summary.category == category))
+        # Or a category created again later would inherit them
+        await db.execute(delete(Delta).where(Delta.category == category))
+    elif price <= bounds.min_price or price >= bounds.max_price:
+        in_category = select(Sweet).where(Sweet.category == category)
+        await db.execute(
+            update(Summary)
+            .where(Summary.category == category)
+            .values(
+                min_price=in_category.with_only_columns(func.min(Sweet.price)).scalar_subquery(),
+                max_price=in_category.with_only_columns(func.max(Sweet.price)).scalar_subquery(),
+            )
+        )
+
+
+async def move_sweet(db, before: tuple, after: tuple):
+    """Re-count a sweet whose ``(category, price, quantity)`` changed from ``before`` to ``after``."""
+    await lock(db, [before[0], after[0]])
+    await remove_sweet(db, *before)
+    await add_sweet(db, *after)
+
+
+async def adjust_stock(db, deltas: dict[str, tuple[int, float]]):
+    """Record ``{category: (quantity_delta, value_delta)}`` from stock changes, insert-only."""
+    rows = [
+        {"category": category, "quantity": quantity, "stock_value": value}
+        for category, (quantity, value) in sorted(deltas.items())
+        if quantity
+    ]
+    if rows:
+        await db.execute(insert(Delta.__table__), rows)
+
+
+def stock_deltas(rows, amounts: dict[int, int]) -> dict[str, tuple[int, float]]:
+    """Group ``{sweet_id: quantity_delta}`` by category, using each row's category and price."""
+    deltas: dict[str, tuple[int, float]] = {}
+    for row in rows:
+        quantity, value = deltas.get(row.category, (0, 0.0))
+        amount = amounts[row.id]
+        deltas[row.category] = (quantity + amount, value + amount * row.price)
+    return deltas
+
+
+def _aggregate():
+    return select(
+        Sweet.category,
+        func.count().label("sweet_count"),
+        func.coalesce(func.sum(Sweet.quantity), 0).label("total_quantity"),
+        func.coalesce(func.sum(Sweet.price * func.coalesce(Sweet.quantity, 0)), 0.0).label("stock_value"),
+        func.min(Sweet.price).label("min_price"),
+        func.max(Sweet.price).label("max_price"),
+    ).group_by(Sweet.category)
+
+
+SUMMARY_COLUMNS = ["category", "sweet_count", "total_quantity", "stock_value", "min_price", "max_price"]
+
+
+def current():
+    """Summary rows with their pending stock deltas added in."""
+    pending = (
+        select(Delta.category, func.sum(Delta.quantity).label("quantity"), func.sum(Delta.stock_value).label("value"))
+        .group_by(Delta.category)
+        .subquery()
+    )
+    return select(
+        Summary.category,
+        Summary.sweet_count,
+        (Summary.total_quantity + func.coalesce(pending.c.quantity, 0)).label("total_quantity"),
+        (Summary.stock_value + func.coalesce(pending.c.value, 0.0)).label("stock_value"),
+        Summary.min_price,
+        Summary.max_price,
+    ).outerjoin(pending, pending.c.category == Summary.category)
+
+
+async def lock(db, categories):
+    """Lock existing summary rows in category order, so multi-category writes can't deadlock."""
+    await db.execute(
+        select(Summary.category)
+        .where(Summary.category.in_(sorted(set(categories))))
+        .order_by(Summary.category)
+        .with_for_update()
+    )
+
+
+def rebuild_statements(dialect: str):
+    """Statements that recompute every summary from scratch; run them in one transaction.
+
+    Under READ COMMITTED each statement sees a new snapshot, so a purchase
+    committing between the delta DELETE and the aggregate would be counted
+    twice. On Postgres the sweets table is locked against writers first;
+    SQLite already runs one writer at a time.
+    """
+    statements = [delete(Summary), delete(Delta), insert(Summary).from_select(SUMMARY_COLUMNS, _aggregate())]
+    if dialect == "postgresql":
+        statements.insert(0, text("LOCK TABLE sweets IN SHARE ROW EXCLUSIVE MODE"))
+    return statements
+
+
+async def refresh_categories(db, categories):
+    """Recompute just ``categories`` from their rows, for set-based batch writes."""
+    categories = sorted(set(categories))
+    if not categories:
+        return
+    # Stock changes hold their sweet row until the delta is committed, so with
+    # the categories' rows held none can land between the DELETE and the aggregate
+    await db.execute(
+        select(Sweet.id).where(Sweet.category.in_(categories)).order_by(Sweet.id).with_for_update()
+    )
+    await lock(db, categories)
+    await db.execute(delete(Summary).where(Summary.category.in_(categories)))
+    await db.execute(delete(Delta).where(Delta.category.in_(categories)))
+    await db.execute(
+        insert(Summary).from_select(SUMMARY_COLUMNS, _aggregate().where(Sweet.category.in_(categories)))
+    )
+
+
+# ------------------ FOLDING ------------------
+_fold_summary = (
+    update(Summary.__table__)
+    .where(Summary.__table__.c.category == bindparam("folded_category"))
+    .values(
+        total_quantity=Summary.__table__.c.total_quantity + bindparam("folded_quantity"),
+        stock_value=Summary.__table__.c.stock_value + bindparam("folded_value"),
+    )
+)
+
+
+async def fold(db) -> int:
+    """Move pending stock deltas into their summaries; returns how many were folded.
+
+    Deltas of categories without a summary row are dropped.
+    """
+    categories = (await db.scalars(select(Delta.category).distinct())).all()
+    if not categories:
+        return 0
+    await lock(db, categories)
+    # Only the rows this statement deletes are counted, whatever commits meanwhile
+    taken = delete(Delta).where(Delta.category.in_(categories))
+    if db.get_bind().dialect.delete_returning:
+        rows = (await db.execute(taken.returning(Delta.category, Delta.quantity, Delta.stock_value))).all()
+    else:
+        rows = (await db.execute(select(Delta.id, Delta.category, Delta.quantity, Delta.stock_value)
+                                 .where(Delta.category.in_(categories)))).all()
+        await db.execute(delete(Delta).where(Delta.id.in_([row.id for row in rows])))
+        rows = [row[1:] for row in rows]
+
+    totals: dict[str, list] = {}
+    for category, quantity, value in rows:
+        total = totals.setdefault(category, [0, 0.0])
+        total[0] += quantity
+        total[1] += value
+    if totals:
+        await db.execute(
+            _fold_summary,
+            [
+                {"folded_category": category, "folded_quantity": quantity, "folded_value": value}
+                for category, (quantity, value) in sorted(totals.items())
+            ],
+        )
+    return len(rows)
+
+
+async def fold_periodically(sessionmaker, interval: float = FACETS_FOLD_SECONDS):
+    """Run ``fold`` every ``interval`` seconds until cancelled."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with sessionmaker() as db:
+                await fold(db)
+                await db.commit()
+        except Exception:
+            logger.warning("Folding facet stock deltas failed, retrying next round", exc_info=True)
+
+
+async def rebuild(db):
+    for stmt in rebuild_statements(db.get_bind().dialect.name):
+        await db.execute(stmt)
+
+
+def rebuild_sync(engine):
+    with engine.begin() as conn:
+        for stmt in rebuild_statements(engine.dialect.name):
+            conn.execute(stmt)
+
+
+def install(engine):
+    """Fill the summaries on first start against an existing catalog."""
+    with engine.connect() as conn:
+        empty = conn.scalar(select(func.count()).select_from(Summary)) == 0
+    if empty:
+        rebuild_sync(engine)
+
+
+async def verify(db) -> list[dict]:
+    """Compare the summaries with a fresh aggregate; returns the categories that differ."""
+    fields = ("sweet_count", "total_quantity", "stock_value", "min_price", "max_price")
+    expected = {row.category: row for row in (await db.execute(_aggregate())).all()}
+    actual = {row.category: row for row in (await db.execute(current())).all()}
+
+    mismatches = []
+    for category in sorted(expected.keys() | actual.keys()):
+        want, have = expected.get(category), actual.get(category)
+        diffs = {
+            field: {"expected": getattr(want, field, None), "actual": getattr(have, field, None)}
+            for field in fields
+            if not _same(getattr(want, field, None), getattr(have, field, None))
+        }
+        if diffs:
+            mismatches.append({"category": category, **diffs})
+    return mismatches
+
+
+def _same(a, b) -> bool:
+    if a is None or b is None:
+        return a is b
+    # stock_value is a running float sum, allow for rounding drift
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-6)
@@ -0,0 +1,110 @@
+import asyncio
+import os
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import insert
+
+from app import facets, models
+from app.crud import take_stock
+from app.db import AsyncSessionLocal
+from app.query_stats import current_stats
+from app.stock_feed import stock_feed
+
+FLASH_SALE_MODE = os.getenv("FLASH_SALE_MODE", "0") == "1"
+FLASH_SALE_WINDOW_MS = float(os.getenv("FLASH_SALE_WINDOW_MS", 5))
+FLASH_SALE_MAX_BATCH = int(os.getenv("FLASH_SALE_MAX_BATCH", 200))
+
+
+class PurchaseBatcher:
+    """Group-commit single-unit purchases of the same sweet.
+
+    Requests for a sweet queue up for ``window_ms``; one writer task per
+    sweet then takes as much stock as the batch needs in a single
+    transaction and hands each waiter its row, or None once sold out.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, window_ms: float = FLASH_SALE_WINDOW_MS,
+                 max_batch: int = FLASH_SALE_MAX_BATCH):
+        self.session_factory = session_factory
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: dict[int, list] = {}  # sweet_id -> [(user_id, future)]
+        self._writers: dict[int, asyncio.Task] = {}
+        self.purchases = 0
+        self.commits = 0
+        self.batch_sizes = Counter()
+
+    async def purchase(self, sweet_id: int, user_id: int):
+        future = asyncio.get_running_loop().create_future()
+        self._pending.setdefault(sweet_id, []).append((user_id, future))
+        if sweet_id not in self._writers:
+            self._writers[sweet_id] = asyncio.create_task(self._drain(sweet_id))
+        return await future
+
+    async def _drain(self, sweet_id: int):
+        # The writer serves many requests, don't charge its queries to the one that started it
+        current_stats.set(None)
+        try:
+            while self._pending.get(sweet_id):
+                if len(self._pending[sweet_id]) < self.max_batch:
+                    await asyncio.sleep(self.window)
+                queue = self._pending[sweet_id]
+                batch, self._pending[sweet_id] = queue[:self.max_batch], queue[self.max_batch:]
+                await self._apply(sweet_id, batch)
+        finally:
+            # No await between the emptiness check and here, so no request can slip in unseen
+            self._pending.pop(sweet_id, None)
+            self._writers.pop(sweet_id, None)
+
+    async def _apply(self, sweet_id: int, batch):
+        # Requests cancelled while queued (client went away) get no stock
+        batch = [(user_id, future) for user_id, future in batch if not future.done()]
+        if not batch:
+            return
+        try:
+            async with self.session_factory() as db:
+                row, granted = await take_stock(db, sweet_id, len(batch))
+                if granted:
+                    await facets.adjust_stock(db, facets.stock_deltas([row], {sweet_id: -granted}))
+                    await db.execute(
+                        insert(models.StockMovement),
+                        [
+                            {"sweet_id": sweet_id, "delta": -1, "reason": "purchase", "user_id": user_id}
+                            for user_id, _ in batch[:granted]
+                        ],
+                    )
+                await db.commit()
+        except Exception:
+            error = HTTPException(status_code=500, detail="Database error while purchasing sweet")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        if granted:
+            # One event for the whole batch, with the stock actually left
+            stock_feed.publish_sweet(row)
+        self.commits += 1
+        self.purchases += granted
+        self.batch_sizes[len(batch)] += 1
+        # Hand out quantities as if the purchases had run one after another
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if i < granted:
+                future.set_result({**row._mapping, "quantity": row.quantity + granted - 1 - i})
+            else:
+                future.set_result(None)
+
+    def stats(self) -> dict:
+        batches = sum(self.batch_sizes.values())
+        return {
+            "purchases": self.purchases,
+            "commits": self.commits,
+            "mean_batch_size": sum(k * v for k, v in self.batch_sizes.items()) / batches if batches else 0.0,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+        }
+
+
+purchase_batcher = PurchaseBatcher()
@@ -1,18 +1,37 @@
 #models.Base.metadata.create_all(bind=engine)
+import asyncio
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
-from app import models
-from app.db import engine
-from app.routers import auth, sweets
+from app import facets, models, search
+from app.db import AsyncSessionLocal, async_engine, engine, replica_engines
+from app.metrics import MetricsMiddleware, registry
+from app.pagination import NEXT_CURSOR_HEADER
+from app.profiling import PROFILE_DIR, ProfilerMiddleware
+from app.query_stats import QueryStatsMiddleware
+from app.routers import auth, ops, sweets
 
 # Create the database tables
 models.Base.metadata.create_all(bind=engine)
+search.install(engine)
+facets.install(engine)
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    folder = asyncio.create_task(facets.fold_periodically(AsyncSessionLocal))
+    yield
+    folder.cancel()
+    await async_engine.dispose()
+    for replica in replica_engines:
+        await replica.dispose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,11 +39,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],   # allow all HTTP methods (GET, POST, PUT, DELETE, etc.)
     allow_headers=["*"],   # allow all headers
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Server-Timing"],
 )
+# Not installed at all unless PROFILE_DIR is set
+if PROFILE_DIR:
+    app.add_middleware(ProfilerMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+# Outermost, so it times everything else
+app.add_middleware(MetricsMiddleware)
 
 #Router
 app.include_router(auth.router)
 app.include_router(sweets.router)
+app.include_router(ops.router)
 @app.get("/")
 def root():
-    return {"message": "Sweet Shop API is running 🚀"}
\ No newline at end of file
+    return {"message": "Sweet Shop API is running 🚀"}
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
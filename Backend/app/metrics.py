@@ -0,0 +1,144 @@
+import time
+from bisect import bisect_left
+
+from app import catalog_cache
+from app.db import async_engine, replica_engines
+from app.pool_metrics import engine_stats
+from app.security import user_cache
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str) -> list[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{labels}}} {self.sum}")
+        lines.append(f"{name}_count{{{labels}}} {self.count}")
+        return lines
+
+
+def _label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Registry:
+    """Request metrics, only ever touched from the event loop thread."""
+
+    def __init__(self):
+        self.requests: dict[tuple, int] = {}  # (method, route, status) -> count
+        self.latency: dict[tuple, Histogram] = {}  # (method, route) -> seconds
+        self.sizes: dict[tuple, Histogram] = {}  # (method, route) -> response bytes
+        self.in_flight = 0
+
+    def observe(self, method: str, route: str, status: int, seconds: float, size: int):
+        key = (method, route)
+        self.requests[(method, route, status)] = self.requests.get((method, route, status), 0) + 1
+        if key not in self.latency:
+            self.latency[key] = Histogram(LATENCY_BUCKETS)
+            self.sizes[key] = Histogram(SIZE_BUCKETS)
+        self.latency[key].observe(seconds)
+        self.sizes[key].observe(size)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_total Requests by method, route template and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (method, route, status), count in self.requests.items():
+            lines.append(f'http_requests_total{{method="{method}",route="{_label(route)}",status="{status}"}} {count}')
+
+        for name, kind, metrics in (
+            ("http_request_duration_seconds", "Request latency.", self.latency),
+            ("http_response_size_bytes", "Response body size.", self.sizes),
+        ):
+            lines += [f"# HELP {name} {kind}", f"# TYPE {name} histogram"]
+            for (method, route), histogram in metrics.items():
+                lines += histogram.render(name, f'method="{method}",route="{_label(route)}"')
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        lines += _pool_lines() + _cache_lines()
+        return "\n".join(lines) + "\n"
+
+
+def _pool_lines() -> list[str]:
+    lines = []
+    engines = [("primary", async_engine)] + [(f"replica{i}", r) for i, r in enumerate(replica_engines)]
+    for metric, key, kind in (
+        ("db_pool_checked_out", "checked_out", "gauge"),
+        ("db_pool_idle", "idle", "gauge"),
+        ("db_pool_timeouts_total", "timeouts", "counter"),
+    ):
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, engine in engines:
+            stats = engine_stats(engine.sync_engine)
+            if key in stats:
+                lines.append(f'{metric}{{engine="{name}"}} {stats[key]}')
+    return lines
+
+
+def _cache_lines() -> list[str]:
+    lines = ["# TYPE cache_hits_total counter", "# TYPE cache_misses_total counter"]
+    for name, cache in (("users", user_cache), ("catalog_pages", catalog_cache.page_cache)):
+        stats = cache.stats()
+        lines.append(f'cache_hits_total{{cache="{name}"}} {stats["hits"]}')
+        lines.append(f'cache_misses_total{{cache="{name}"}} {stats["misses"]}')
+    return lines
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """Plain ASGI middleware recording count, latency and size per route template.
+
+    Labels use the matched route's path (``/api/sweets/{sweet_id}``), never
+    the raw URL, so the number of series stays bounded.
+    """
+
+    def __init__(self, app, registry: Registry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status, size = 500, 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.registry.in_flight -= 1
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.registry.observe(scope["method"], route, status, time.perf_counter() - start, size)
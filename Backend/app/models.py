@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Float, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, Float, ForeignKey, Index, Integer, String, func
 from sqlalchemy.orm import declarative_base, relationship
 
 Base = declarative_base()
@@ -18,3 +18,55 @@ class Sweet(Base):
     category = Column(String, index=True, nullable=False, default="Uncategorized")
     price = Column(Float, nullable=False)
     quantity = Column(Integer, default=0)
+    # Bumped by every write to the row, feeds the single-sweet ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    # Keyset pagination seeks on (price, id); facets read a category's price range
+    __table_args__ = (
+        Index("ix_sweets_price_id", "price", "id"),
+        Index("ix_sweets_category_price", "category", "price"),
+    )
+
+class StockMovement(Base):
+    """Append-only log of every stock change, newest rows last.
+
+    sweet_id/user_id are plain columns rather than foreign keys so the
+    history survives deleting the sweet or the user.
+    """
+    __tablename__ = "stock_movements"
+    id = Column(Integer, primary_key=True)
+    sweet_id = Column(Integer, nullable=False)
+    delta = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)  # "initial", "purchase", "restock", "adjustment"
+    user_id = Column(Integer, nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=func.now())
+
+    __table_args__ = (Index("ix_stock_movements_sweet_id_id", "sweet_id", "id"),)
+
+
+class CategorySummary(Base):
+    """Per-category catalog aggregates, kept current by every sweets write.
+
+    Stock changes land in CategoryStockDelta first and are folded in later.
+    See app/facets.py; rebuildable from the sweets table at any time.
+    """
+    __tablename__ = "category_summaries"
+    category = Column(String, primary_key=True)
+    sweet_count = Column(Integer, nullable=False, default=0)
+    total_quantity = Column(Integer, nullable=False, default=0)
+    stock_value = Column(Float, nullable=False, default=0.0)  # sum of price * quantity
+    min_price = Column(Float, nullable=True)
+    max_price = Column(Float, nullable=True)
+
+
+class CategoryStockDelta(Base):
+    """Stock changes not yet folded into category_summaries.
+
+    Purchases and restocks only ever insert here, so concurrent buyers in one
+    category never wait on each other's summary row.
+    """
+    __tablename__ = "category_stock_deltas"
+    id = Column(Integer, primary_key=True)
+    category = Column(String, nullable=False, index=True)
+    quantity = Column(Integer, nullable=False)
+    stock_value = Column(Float, nullable=False)
@@ -0,0 +1,60 @@
+import base64
+import json
+from typing import Literal
+
+from fastapi import HTTPException
+from sqlalchemy import tuple_
+
+from app import models
+
+SortKey = Literal["id", "price", "name"]
+SearchSortKey = Literal["id", "price", "name", "relevance"]
+
+SORT_COLUMNS = {
+    "id": models.Sweet.id,
+    "price": models.Sweet.price,
+    "name": models.Sweet.name,
+}
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort: SortKey, sweet) -> str:
+    raw = json.dumps([sort, getattr(sweet, sort), sweet.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: SortKey):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if cursor_sort != sort:
+        raise HTTPException(status_code=400, detail="Cursor does not match sort order")
+    return value, last_id
+
+
+def keyset(query, sort: SortKey, after: str | None):
+    """Order ``query`` by ``(sort, id)`` and start right after ``after``.
+
+    Seeks straight to the cursor position through the index instead of
+    scanning and discarding rows like OFFSET does.
+    """
+    column = SORT_COLUMNS[sort]
+    if after:
+        value, last_id = decode_cursor(after, sort)
+        if sort == "id":
+            query = query.where(models.Sweet.id > last_id)
+        else:
+            query = query.where(tuple_(column, models.Sweet.id) > tuple_(value, last_id))
+    if sort == "id":
+        return query.order_by(models.Sweet.id)
+    return query.order_by(column, models.Sweet.id)
+
+
+def next_cursor(sweets, sort: SortKey, limit: int) -> str | None:
+    # A short page means there's nothing after it
+    if sweets and len(sweets) == limit:
+        return encode_cursor(sort, sweets[-1])
+    return None
@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+
+def pool_options(is_async: bool = False) -> dict:
+    """Engine keyword arguments for the pool settings found in the environment."""
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", 5)),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", 10)),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", -1)),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "0") == "1",
+    }
+    stats = PoolStats()
+    options["poolclass"] = timed_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, stats)
+    return options
+
+
+class PoolStats:
+    """Counters for one engine's connection pool."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool):
+        with self._lock:
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def attach(self, engine):
+        @event.listens_for(engine, "connect")
+        def _connect(dbapi_connection, record):
+            self.connects += 1
+
+        @event.listens_for(engine, "checkout")
+        def _checkout(dbapi_connection, record, proxy):
+            self.checkouts += 1
+
+        @event.listens_for(engine, "checkin")
+        def _checkin(dbapi_connection, record):
+            self.checkins += 1
+
+    def snapshot(self, pool) -> dict:
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": self.wait_total / self.checkouts * 1000 if self.checkouts else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+def timed_pool_class(base, stats: PoolStats):
+    """Subclass ``base`` so every checkout's wait lands in ``stats``.
+
+    The stats ride on the class, so pools recreated by dispose() keep them.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        timed_out = False
+        try:
+            return base.connect(self)
+        except exc.TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            stats.record_wait(time.perf_counter() - start, timed_out)
+
+    return type(f"Timed{base.__name__}", (base,), {"stats": stats, "connect": connect})
+
+
+def engine_stats(engine) -> dict:
+    pool = engine.pool
+    stats = getattr(pool, "stats", None)
+    if stats is None:
+        return {"status": pool.status()}
+    return stats.snapshot(pool)
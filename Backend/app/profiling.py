@@ -0,0 +1,63 @@
+import asyncio
+import cProfile
+import hmac
+import os
+import random
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Profiling is only wired in when PROFILE_DIR is set
+PROFILE_DIR = os.getenv("PROFILE_DIR")
+# Requests carrying "X-Profile: <PROFILE_TOKEN>" are profiled
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+# Fraction of all other requests to profile (0 = only on request)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+
+PROFILE_HEADER = b"x-profile"
+
+
+class ProfilerMiddleware:
+    """Run selected requests under cProfile and dump pstats files to ``directory``.
+
+    Files are named ``<time>_<METHOD>_<route>_<ms>ms.pstats``; open them with
+    ``python -m pstats`` or convert them to a flamegraph (e.g. flameprof).
+    Only one request is profiled at a time, and while it runs the profile also
+    sees whatever else the event loop does.
+    """
+
+    def __init__(self, app, directory: str | None = PROFILE_DIR, token: str | None = PROFILE_TOKEN,
+                 sample_rate: float = PROFILE_SAMPLE_RATE):
+        self.app = app
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self._busy = False
+
+    def _wanted(self, scope) -> bool:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self._busy or not self._wanted(scope):
+            return await self.app(scope, receive, send)
+
+        self._busy = True
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.disable()
+            self._busy = False
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            route = getattr(scope.get("route"), "path", "unmatched")
+            name = re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
+            path = self.directory / f"{datetime.now():%Y%m%dT%H%M%S%f}_{scope['method']}_{name}_{elapsed_ms:.0f}ms.pstats"
+            await asyncio.to_thread(profiler.dump_stats, path)
@@ -0,0 +1,95 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Statements slower than this are logged, with their parameters redacted
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 200))
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+    slowest_seconds: float = 0.0
+    slowest: str | None = None
+
+    def record(self, statement: str, seconds: float):
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds, self.slowest = seconds, statement
+
+    def server_timing(self) -> str:
+        return (
+            f'db;dur={self.seconds * 1000:.2f};desc="{self.count} queries", '
+            f"db-slowest;dur={self.slowest_seconds * 1000:.2f}"
+        )
+
+
+# Stats of the request being served; None outside of a request
+current_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def _redact(parameters, executemany: bool):
+    if executemany:
+        return f"<{len(parameters)} rows>"
+    if isinstance(parameters, dict):
+        return {key: "?" for key in parameters}
+    return ["?"] * len(parameters or ())
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info["query_started"].pop()
+    stats = current_stats.get()
+    if stats is not None:
+        stats.record(statement, seconds)
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        logger.warning(
+            "Slow query (%.1fms): %s params=%s", seconds * 1000, statement, _redact(parameters, executemany)
+        )
+
+
+def instrument(engine):
+    """Time every statement ``engine`` runs and charge it to the current request."""
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class QueryStatsMiddleware:
+    """Collect per-request query stats and report them in a Server-Timing header.
+
+    The stats are also left on ``request.state.query_stats`` for handlers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = QueryStats()
+        scope.setdefault("state", {})["query_stats"] = stats
+        token = current_stats.set(stats)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", stats.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_stats.reset(token)
@@ -0,0 +1,82 @@
+import math
+import os
+import time
+
+from fastapi import HTTPException, Request, status
+
+from app.cache import TTLCache
+
+# Login/register attempts per username: burst, then this many per minute
+AUTH_USER_BURST = int(os.getenv("AUTH_USER_BURST", 5))
+AUTH_USER_PER_MINUTE = float(os.getenv("AUTH_USER_PER_MINUTE", 5))
+# Same, per client IP (several users may share one address)
+AUTH_IP_BURST = int(os.getenv("AUTH_IP_BURST", 10))
+AUTH_IP_PER_MINUTE = float(os.getenv("AUTH_IP_PER_MINUTE", 20))
+# Buckets kept; the least recently used go first, and a full bucket is never stored
+AUTH_LIMITER_SIZE = int(os.getenv("AUTH_LIMITER_SIZE", 100_000))
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by arbitrary strings, in a bounded TTLCache.
+
+    Each entry expires once its bucket would have refilled, so idle keys
+    cost nothing and a missing key means a full bucket. Under a flood of
+    distinct keys the oldest buckets are evicted, which only ever lets a
+    key through sooner, never later.
+    """
+
+    def __init__(self, maxsize: int = AUTH_LIMITER_SIZE):
+        self.buckets = TTLCache(maxsize=maxsize)  # key -> (tokens, updated_at)
+        self.rejected = 0
+
+    def _tokens(self, key: str, burst: int, per_second: float, now: float) -> float:
+        state = self.buckets.get(key)
+        if state is None:
+            return float(burst)
+        tokens, updated_at = state
+        return min(burst, tokens + (now - updated_at) * per_second)
+
+    def acquire(self, limits: list[tuple[str, int, float]]) -> float:
+        """Take one token from every ``(key, burst, per_minute)`` bucket.
+
+        All or nothing: returns 0 when every bucket had a token, otherwise
+        the seconds until the emptiest one has, and takes nothing.
+        """
+        now = time.time()
+        levels = [
+            (key, burst, per_minute / 60, self._tokens(key, burst, per_minute / 60, now))
+            for key, burst, per_minute in limits
+        ]
+        wait = max(((1 - tokens) / per_second for _, _, per_second, tokens in levels if tokens < 1), default=0.0)
+        if wait:
+            self.rejected += 1
+            return wait
+        for key, burst, per_second, tokens in levels:
+            tokens -= 1
+            self.buckets.set(key, (tokens, now), expires_at=now + (burst - tokens) / per_second)
+        return 0.0
+
+    def clear(self):
+        self.buckets.clear()
+
+
+auth_limiter = TokenBucketLimiter()
+
+
+def throttle_auth(request: Request, username: str):
+    """Reject with 429 once this username or client IP is out of attempts.
+
+    Called before any database or bcrypt work, so throttled requests cost
+    almost nothing.
+    """
+    client_ip = request.client.host if request.client else "unknown"
+    wait = auth_limiter.acquire([
+        (f"user:{username.strip().lower()}", AUTH_USER_BURST, AUTH_USER_PER_MINUTE),
+        (f"ip:{client_ip}", AUTH_IP_BURST, AUTH_IP_PER_MINUTE),
+    ])
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts, try again later",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
@@ -1,28 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import crud, models, schemas
-from app.db import get_db
+from app.db import get_async_db
 from app.models import User
+from app.rate_limit import throttle_auth
 from app.security import create_access_token
+from app.utils import verify_and_update_password
 
 router = APIRouter(prefix="/api/auth", tags=["Auth"])
 
 @router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_user(request: Request, user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    throttle_auth(request, user.username)
     # Check if email already exists
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
 
     # Pass role from request (defaults to "user")
-    return crud.create_user(db=db, user=user, role=user.role)
+    return await crud.create_user(db=db, user=user, role=user.role)
 
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # @router.post("/login")
 # def login(
 #     form_data: OAuth2PasswordRequestForm = Depends(),
@@ -43,21 +44,34 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 
 @router.post("/login")
-def login(
+async def login(
+    request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     username = form_data.username.strip()
     password = form_data.password.strip()
+    throttle_auth(request, username)
     # Look up user by username
-    db_user = db.query(User).filter(User.username == username).first()
-    if not db_user or not pwd_context.verify(password, db_user.hashed_password):
+    db_user = await db.scalar(select(User).where(User.username == username))
+    # Hand the connection back to the pool while bcrypt runs
+    await db.commit()
+
+    verified, new_hash = False, None
+    if db_user:
+        verified, new_hash = await verify_and_update_password(password, db_user.hashed_password)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    # Cost factor changed since this hash was made, upgrade it
+    if new_hash:
+        db_user.hashed_password = new_hash
+        await db.commit()
+
     # Generate JWT token
     access_token = create_access_token({"sub": db_user.username})
 
@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import catalog_cache, facets, flash_sale
+from app.crud import get_current_admin
+from app.db import async_engine, engine, get_write_db, replica_engines
+from app.pool_metrics import engine_stats
+from app.security import CurrentUser, user_cache
+
+router = APIRouter(prefix="/api/ops", tags=["ops"])
+
+
+# ------------------ CONNECTION POOLS (ADMIN ONLY) ------------------
+@router.get("/pool")
+async def pool_stats(_: CurrentUser = Depends(get_current_admin)):
+    return {
+        "primary": engine_stats(async_engine.sync_engine),
+        "primary_sync": engine_stats(engine),
+        "replicas": [engine_stats(replica.sync_engine) for replica in replica_engines],
+    }
+
+
+# ------------------ CACHES (ADMIN ONLY) ------------------
+@router.get("/caches")
+async def cache_stats(_: CurrentUser = Depends(get_current_admin)):
+    return {
+        "users": user_cache.stats(),
+        "catalog_pages": catalog_cache.page_cache.stats(),
+        "flash_sale": flash_sale.purchase_batcher.stats(),
+    }
+
+
+# ------------------ FACET SUMMARIES (ADMIN ONLY) ------------------
+@router.get("/facets/verify")
+async def verify_facets(db: AsyncSession = Depends(get_write_db), _: CurrentUser = Depends(get_current_admin)):
+    # Against the primary: a lagging replica would report false mismatches
+    mismatches = await facets.verify(db)
+    return {"consistent": not mismatches, "mismatches": mismatches}
+
+
+@router.post("/facets/rebuild")
+async def rebuild_facets(db: AsyncSession = Depends(get_write_db), _: CurrentUser = Depends(get_current_admin)):
+    await facets.rebuild(db)
+    await db.commit()
+    return {"consistent": not await facets.verify(db)}
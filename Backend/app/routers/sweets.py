@@ -1,22 +1,53 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import csv
+import io
+import json
+import tempfile
+from typing import Literal
 
-from app import models, schemas
-from app.crud import get_current_admin
-from app.db import get_db
-from app.security import get_current_user
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+from app import catalog_cache, facets, flash_sale, models, schemas
+from app.bulk_import import import_file
+from app.crud import (
+    SWEET_COLUMNS,
+    batch_filter,
+    change_stock,
+    checkout_stock,
+    delete_where,
+    get_current_admin,
+    lock_where,
+    record_movements,
+    update_where,
+)
+from app.db import get_read_db, get_write_db, read_sessionmaker, reads_from_primary, stick_to_primary
+from app.pagination import SearchSortKey, SortKey, keyset, next_cursor
+from app.search import text_search
+from app.security import (
+    STREAM_TOKEN_EXPIRE_SECONDS,
+    CurrentUser,
+    create_stream_token,
+    get_current_user,
+    get_stream_user,
+)
+from app.stock_feed import format_sse, stock_feed
+from app.suggest import suggest_index
 
 router = APIRouter(prefix="/api/sweets", tags=["sweets"])
 
 
 # ------------------ CREATE SWEET (ADMIN ONLY) ------------------
 @router.post("/", response_model=schemas.SweetResponse, status_code=status.HTTP_201_CREATED)
-def create_sweet(
+async def create_sweet(
     sweet: schemas.SweetCreate,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_write_db),
+    admin: CurrentUser = Depends(get_current_admin)
 ):
-    db_sweet = db.query(models.Sweet).filter(models.Sweet.name == sweet.name).first()
+    db_sweet = await db.scalar(select(models.Sweet).where(models.Sweet.name == sweet.name))
     if db_sweet:
         raise HTTPException(status_code=400, detail="Sweet already exists")
     
@@ -24,152 +55,522 @@ def create_sweet(
 
     try:
         db.add(new_sweet)
-        db.commit()
-        db.refresh(new_sweet)
+        await db.flush()
+        await facets.add_sweet(db, new_sweet.category, new_sweet.price, new_sweet.quantity)
+        await record_movements(db, {new_sweet.id: new_sweet.quantity}, "initial", admin.id)
+        await db.commit()
+        await db.refresh(new_sweet)
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error while creating sweet")
-    
+
+    catalog_cache.bump_catalog_version()
+    suggest_index.upsert(new_sweet.id, new_sweet.name, new_sweet.category, new_sweet.quantity)
+    stock_feed.publish_sweet(new_sweet)
     return new_sweet
 
+# ------------------ BULK IMPORT (ADMIN ONLY) ------------------
+IMPORT_SPOOL_BYTES = 1024 * 1024
+
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_sweets(
+    request: Request,
+    format: Literal["csv", "ndjson"] | None = None,
+    batch_size: int = Query(1000, ge=1, le=10000),
+    update_existing: bool = False,
+    admin: CurrentUser = Depends(get_current_admin)
+):
+    stick_to_primary(request)
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "csv" if "csv" in content_type else "ndjson"
+
+    # Spool the upload (to disk past 1 MB) instead of holding it in memory
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES, mode="w+b") as spool:
+        async for chunk in request.stream():
+            spool.write(chunk)
+        spool.seek(0)
+        text = io.TextIOWrapper(spool, encoding="utf-8", newline="")
+        report = await run_in_threadpool(import_file, text, format, batch_size, update_existing, admin.id)
+        text.detach()
+
+    # Also after a failed batch: the ones before it are committed
+    if report["written"]:
+        catalog_cache.bump_catalog_version()
+        suggest_index.invalidate()
+        stock_feed.publish_reset()
+    if report["failed_at_line"] is not None:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Database error while importing the batch starting at line {report['failed_at_line']}; "
+                   f"{report['written']} rows before it were kept",
+        )
+    return report
+
+
+# ------------------ BATCH UPDATE / RESTOCK / DELETE (ADMIN ONLY) ------------------
+# Set-based: one statement for all matching sweets, one transaction, one auth check
+@router.post("/batch/update", response_model=list[schemas.SweetResponse])
+async def batch_update_sweets(
+    batch: schemas.BatchUpdate,
+    db: AsyncSession = Depends(get_write_db),
+    admin: CurrentUser = Depends(get_current_admin)
+):
+    changes = batch.changes.model_dump(exclude_none=True)
+    if not changes:
+        raise HTTPException(status_code=400, detail="Nothing to update")
+
+    where = batch_filter(batch)
+    try:
+        before = {row.id: row for row in await lock_where(db, where)}
+        sweets = await update_where(db, where, changes)
+        adjustment = {
+            sweet.id: sweet.quantity - (before[sweet.id].quantity or 0)
+            for sweet in sweets
+            if sweet.id in before and sweet.quantity != before[sweet.id].quantity
+        }
+        await facets.refresh_categories(db, [row.category for row in before.values()] + [s.category for s in sweets])
+        await record_movements(db, adjustment, "adjustment", admin.id)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error while updating sweets")
+
+    if sweets:
+        catalog_cache.bump_catalog_version()
+    for sweet in sweets:
+        suggest_index.upsert(sweet.id, sweet.name, sweet.category, sweet.quantity)
+        stock_feed.publish_sweet(sweet)
+    return sweets
+
+
+@router.post("/batch/restock", response_model=list[schemas.SweetResponse])
+async def batch_restock_sweets(
+    batch: schemas.BatchRestock,
+    db: AsyncSession = Depends(get_write_db),
+    admin: CurrentUser = Depends(get_current_admin)
+):
+    try:
+        # Lock first, in id order like checkout, then touch exactly the locked rows
+        locked = await lock_where(db, batch_filter(batch))
+        where = models.Sweet.id.in_([row.id for row in locked])
+        sweets = await update_where(db, where, {"quantity": models.Sweet.quantity + batch.amount})
+        amounts = {sweet.id: batch.amount for sweet in sweets}
+        await facets.adjust_stock(db, facets.stock_deltas(sweets, amounts))
+        await record_movements(db, amounts, "restock", admin.id)
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error while restocking sweets")
+
+    if sweets:
+        catalog_cache.bump_catalog_version()
+    for sweet in sweets:
+        stock_feed.publish_sweet(sweet)
+    return sweets
+
+
+@router.post("/batch/delete", response_model=list[schemas.SweetResponse])
+async def batch_delete_sweets(
+    batch: schemas.BatchFilter,
+    db: AsyncSession = Depends(get_write_db),
+    _: CurrentUser = Depends(get_current_admin)
+):
+    try:
+        locked = await lock_where(db, batch_filter(batch))
+        sweets = await delete_where(db, models.Sweet.id.in_([row.id for row in locked]))
+        await facets.refresh_categories(db, [sweet.category for sweet in sweets])
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error while deleting sweets")
+
+    if sweets:
+        catalog_cache.bump_catalog_version()
+    for sweet in sweets:
+        stock_feed.publish(sweet.id, deleted=True)
+    return sweets
+
+
 # ------------------ LIST SWEETS (ALL USERS) ------------------
 @router.get("/", response_model=list[schemas.SweetResponse])
-def list_sweets(
+async def list_sweets(
+    request: Request,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_user)
+    after: str | None = None,
+    sort: SortKey = "id",
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    _: CurrentUser = Depends(get_current_user)
 ):
-    return db.query(models.Sweet).offset(skip).limit(limit).all()
+    key, cached = catalog_cache.lookup(
+        "list", skip, limit, after, sort, if_none_match=if_none_match, bypass=reads_from_primary(request)
+    )
+    if cached is not None:
+        return cached
+
+    query = keyset(select(*catalog_cache.RESPONSE_COLUMNS), sort, after)
+    sweets = (await db.execute(query.offset(skip).limit(limit))).all()
+    return catalog_cache.store(key, sweets, next_cursor(sweets, sort, limit), if_none_match)
+
+
+# ------------------ EXPORT CATALOG (ADMIN ONLY) ------------------
+EXPORT_BATCH_SIZE = 1000
+EXPORT_COLUMNS = [c.key for c in SWEET_COLUMNS]
+
+
+async def _export_rows(format: str, sessionmaker):
+    # Plain row tuples over a server-side cursor, one partition in memory at a time
+    async with sessionmaker() as db:
+        result = await db.stream(
+            select(*SWEET_COLUMNS).order_by(models.Sweet.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        if format == "csv":
+            yield ",".join(EXPORT_COLUMNS) + "\r\n"
+        async for rows in result.partitions():
+            buf = io.StringIO()
+            if format == "csv":
+                csv.writer(buf).writerows(rows)
+            else:
+                for row in rows:
+                    buf.write(json.dumps(dict(zip(EXPORT_COLUMNS, row)), separators=(",", ":")))
+                    buf.write("\n")
+            yield buf.getvalue()
+
+
+@router.get("/export")
+async def export_sweets(
+    request: Request,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    _: CurrentUser = Depends(get_current_admin)
+):
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_rows(format, read_sessionmaker(request)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="sweets.{format}"'},
+    )
 
 
 # ------------------ UPDATE SWEET (ADMIN ONLY) ------------------
 @router.patch("/{sweet_id}", response_model=schemas.SweetResponse)
-def update_sweet(
+async def update_sweet(
     sweet_id: int,
     sweet: schemas.SweetUpdate,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_write_db),
+    admin: CurrentUser = Depends(get_current_admin)
 ):
-    db_sweet = db.get(models.Sweet, sweet_id)
+    db_sweet = await db.get(models.Sweet, sweet_id, with_for_update=True)
 
     if not db_sweet:
         raise HTTPException(status_code=404, detail="Sweet not found")
+    before = (db_sweet.category, db_sweet.price, db_sweet.quantity)
 
     if sweet.category is not None:
         db_sweet.category = sweet.category
     if sweet.price is not None:
         db_sweet.price = sweet.price
+    adjustment = {}
     if sweet.quantity is not None:
+        if sweet.quantity != db_sweet.quantity:
+            adjustment[sweet_id] = sweet.quantity - (db_sweet.quantity or 0)
         db_sweet.quantity = sweet.quantity
+    db_sweet.version = models.Sweet.version + 1
 
     try:
-        db.commit()
-        db.refresh(db_sweet)
+        after = (db_sweet.category, db_sweet.price, db_sweet.quantity)
+        if after[:2] != before[:2]:
+            # Moved between categories or repriced: the price range may change
+            await db.flush()
+            await facets.move_sweet(db, before, after)
+        elif adjustment:
+            await facets.adjust_stock(db, {after[0]: (adjustment[sweet_id], adjustment[sweet_id] * after[1])})
+        await record_movements(db, adjustment, "adjustment", admin.id)
+        await db.commit()
+        await db.refresh(db_sweet)
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error while updating sweet")
-    
+
+    catalog_cache.bump_catalog_version()
+    suggest_index.upsert(db_sweet.id, db_sweet.name, db_sweet.category, db_sweet.quantity)
+    stock_feed.publish_sweet(db_sweet)
     return db_sweet
 
 
 # ------------------ DELETE SWEET (ADMIN ONLY) ------------------
 @router.delete("/{sweet_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_sweet(
+async def delete_sweet(
     sweet_id: int,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_write_db),
+    _: CurrentUser = Depends(get_current_admin)
 ):
     # sweet = db.query(models.Sweet).get(sweet_id)
-    sweet = db.get(models.Sweet, sweet_id)
+    # Locked, so the facets subtract the stock actually left, not a stale read
+    sweet = await db.get(models.Sweet, sweet_id, with_for_update=True)
     if not sweet:
         raise HTTPException(status_code=404, detail="Sweet not found")
     
+    before = (sweet.category, sweet.price, sweet.quantity)
     try:
-        db.delete(sweet)
-        db.commit()
+        await db.delete(sweet)
+        await db.flush()
+        await facets.remove_sweet(db, *before)
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error while deleting sweet")
 
+    catalog_cache.bump_catalog_version()
+    stock_feed.publish(sweet_id, deleted=True)
 
-# ------------------ SEARCH SWEETS (ALL USERS) ------------------
-
-from sqlalchemy import func
 
+# ------------------ SEARCH SWEETS (ALL USERS) ------------------
 
 @router.get("/search", response_model=list[schemas.SweetResponse])
-def search_sweets(
+async def search_sweets(
+    request: Request,
     name: str | None = None,
     category: str | None = None,
     min_price: float | None = None,
     max_price: float | None = None,
     skip: int = 0,
     limit: int = 50,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_user)
+    after: str | None = None,
+    sort: SearchSortKey = "id",
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    _: CurrentUser = Depends(get_current_user)
 ):
-    query = db.query(models.Sweet)
+    # Search is case-insensitive, so differently-cased queries share a cache entry
+    name = name.strip().lower() if name else None
+    category = category.strip().lower() if category else None
 
-    if name:
-        name = name.strip()
-        query = query.filter(models.Sweet.name.ilike(f"%{name}%"))
-        #query = query.filter(func.lower(models.Sweet.name).like(f"%{name.strip()}%"))
+    key, cached = catalog_cache.lookup(
+        "search", name, category, min_price, max_price, skip, limit, after, sort,
+        if_none_match=if_none_match, bypass=reads_from_primary(request),
+    )
+    if cached is not None:
+        return cached
 
-    if category:
-        category = category.strip()
-        query = query.filter(func.lower(models.Sweet.category).like(f"%{category.strip()}%"))
+    query, rank = text_search(select(*catalog_cache.RESPONSE_COLUMNS), name, category)
 
     if min_price is not None:
-        query = query.filter(models.Sweet.price >= min_price)
+        query = query.where(models.Sweet.price >= min_price)
 
     if max_price is not None:
-        query = query.filter(models.Sweet.price <= max_price)
+        query = query.where(models.Sweet.price <= max_price)
+
+    if sort == "relevance":
+        if after:
+            raise HTTPException(status_code=400, detail="Cursors are not supported when sorting by relevance")
+        order = (rank, models.Sweet.id) if rank is not None else (models.Sweet.id,)
+        sweets = (await db.execute(query.order_by(*order).offset(skip).limit(limit))).all()
+        return catalog_cache.store(key, sweets, if_none_match=if_none_match)
+
+    query = keyset(query, sort, after)
+    sweets = (await db.execute(query.offset(skip).limit(limit))).all()
+    return catalog_cache.store(key, sweets, next_cursor(sweets, sort, limit), if_none_match)
+# ------------------ SUGGEST (ALL USERS) ------------------
+@router.get("/suggest", response_model=list[schemas.Suggestion])
+async def suggest_sweets(
+    request: Request,
+    prefix: str = Query(..., min_length=1, max_length=100),
+    limit: int = Query(10, ge=1, le=50),
+    _: CurrentUser = Depends(get_current_user)
+):
+    # Served from memory; the database is only read to build the index the first time
+    await suggest_index.ensure_built(read_sessionmaker(request))
+    return Response(content=orjson.dumps(suggest_index.suggest(prefix, limit)), media_type="application/json")
+
+
+# ------------------ FACETS (ALL USERS) ------------------
+@router.get("/facets", response_model=schemas.Facets)
+async def catalog_facets(
+    db: AsyncSession = Depends(get_read_db),
+    _: CurrentUser = Depends(get_current_user)
+):
+    # One row per category, maintained by the writes themselves (app/facets.py)
+    categories = (await db.execute(facets.current().order_by(models.CategorySummary.category))).all()
+    return {
+        "categories": categories,
+        "sweet_count": sum(c.sweet_count for c in categories),
+        "total_quantity": sum(c.total_quantity for c in categories),
+        "stock_value": sum(c.stock_value for c in categories),
+    }
+
+
+# ------------------ STOCK FEED (ALL USERS) ------------------
+async def _stock_events(last_event_id: str | None):
+    # Subscribed inside the generator so the finally always runs
+    subscription = stock_feed.subscribe(last_event_id)
+    try:
+        while True:
+            yield format_sse(await stock_feed.next_batch(subscription))
+    finally:
+        stock_feed.unsubscribe(subscription)
+
+
+@router.post("/stream/token", response_model=schemas.StreamToken)
+async def create_stream_token_for_user(user: CurrentUser = Depends(get_current_user)):
+    """Short-lived token for ``GET /stream?token=``, since EventSource can't send headers."""
+    return {"token": create_stream_token(user), "expires_in": STREAM_TOKEN_EXPIRE_SECONDS}
+
+
+@router.get("/stream")
+async def stream_stock_changes(
+    last_event_id: str | None = Header(None),
+    _: CurrentUser = Depends(get_stream_user)
+):
+    """Server-sent events: ``stock`` (id, quantity, price, deleted) or ``reset``.
+
+    Authenticate with a bearer header or ``?token=`` from ``POST /stream/token``;
+    the token is only checked when the stream opens, so an EventSource whose
+    reconnect is refused should fetch a new one. Reconnect with Last-Event-ID
+    to resume; a ``reset`` means events were missed and the catalog should be
+    reloaded.
+    """
+    return StreamingResponse(
+        _stock_events(last_event_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# ------------------ GET SWEET (ALL USERS) ------------------
+# Declared after /search and /export so those paths don't match {sweet_id}
+@router.get("/{sweet_id}", response_model=schemas.SweetResponse)
+async def get_sweet(
+    request: Request,
+    sweet_id: int,
+    if_none_match: str | None = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+    _: CurrentUser = Depends(get_current_user)
+):
+    key, cached = catalog_cache.lookup(
+        "sweet", sweet_id, if_none_match=if_none_match, bypass=reads_from_primary(request)
+    )
+    if cached is not None:
+        return cached
+
+    row = (
+        await db.execute(
+            select(*catalog_cache.RESPONSE_COLUMNS, models.Sweet.version).where(models.Sweet.id == sweet_id)
+        )
+    ).first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Sweet not found")
+    return catalog_cache.store_sweet(key, row, if_none_match)
+
 
-    return query.offset(skip).limit(limit).all()
 # ------------------ PURCHASE SWEET (USER ONLY) ------------------
 @router.post("/{sweet_id}/purchase", response_model=schemas.SweetResponse)
-def purchase_sweet(
+async def purchase_sweet(
     sweet_id: int,
-    db: Session = Depends(get_db),
-    user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_write_db),
+    user: CurrentUser = Depends(get_current_user)
 ):
-    sweet = db.get(models.Sweet, sweet_id)
-    if not sweet or sweet.quantity <= 0:
-        raise HTTPException(status_code=400, detail="Sweet not available")
-    
-    sweet.quantity -= 1
+    if flash_sale.FLASH_SALE_MODE:
+        sweet = await flash_sale.purchase_batcher.purchase(sweet_id, user.id)
+        if sweet is None:
+            raise HTTPException(status_code=400, detail="Sweet not available")
+        catalog_cache.bump_catalog_version()
+        return sweet
+
     try:
-        db.commit()
-        db.refresh(sweet)
+        sweet = await change_stock(db, sweet_id, -1)
+        if sweet is not None:
+            await facets.adjust_stock(db, facets.stock_deltas([sweet], {sweet_id: -1}))
+            await record_movements(db, {sweet_id: -1}, "purchase", user.id)
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error while purchasing sweet")
-    
+
+    if sweet is None:
+        raise HTTPException(status_code=400, detail="Sweet not available")
+
+    catalog_cache.bump_catalog_version()
+    stock_feed.publish_sweet(sweet)
     return sweet
 
 
+# ------------------ CHECKOUT CART (USER ONLY) ------------------
+@router.post("/checkout", response_model=list[schemas.SweetResponse])
+async def checkout(
+    cart: schemas.CheckoutRequest,
+    db: AsyncSession = Depends(get_write_db),
+    user: CurrentUser = Depends(get_current_user)
+):
+    items: dict[int, int] = {}
+    for item in cart.items:
+        items[item.sweet_id] = items.get(item.sweet_id, 0) + item.quantity
+
+    try:
+        sweets = await checkout_stock(db, items)
+        if sweets is None:
+            await db.rollback()
+        else:
+            taken = {i: -n for i, n in items.items()}
+            await facets.adjust_stock(db, facets.stock_deltas(sweets, taken))
+            await record_movements(db, taken, "purchase", user.id)
+            await db.commit()
+    except Exception:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail="Database error while checking out")
+
+    if sweets is None:
+        raise HTTPException(status_code=400, detail="Sweet not available")
+
+    catalog_cache.bump_catalog_version()
+    for sweet in sweets:
+        stock_feed.publish_sweet(sweet)
+    return sweets
+
+
 # ------------------ RESTOCK SWEET (ADMIN ONLY) ------------------
 @router.post("/{sweet_id}/restock", response_model=schemas.SweetResponse)
-def restock_sweet(
+async def restock_sweet(
     sweet_id: int,
     amount: int,
-    db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_admin)
+    db: AsyncSession = Depends(get_write_db),
+    admin: CurrentUser = Depends(get_current_admin)
 ):
     if amount <= 0:
         raise HTTPException(status_code=400, detail="Restock amount must be positive")
     
-    sweet = db.get(models.Sweet, sweet_id)
-    if not sweet:
-        raise HTTPException(status_code=404, detail="Sweet not found")
-    
-    sweet.quantity += amount
     try:
-        db.commit()
-        db.refresh(sweet)
+        sweet = await change_stock(db, sweet_id, amount)
+        if sweet is not None:
+            await facets.adjust_stock(db, facets.stock_deltas([sweet], {sweet_id: amount}))
+            await record_movements(db, {sweet_id: amount}, "restock", admin.id)
+        await db.commit()
     except Exception:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail="Database error while restocking sweet")
-    
+
+    if sweet is None:
+        raise HTTPException(status_code=404, detail="Sweet not found")
+
+    catalog_cache.bump_catalog_version()
+    stock_feed.publish_sweet(sweet)
     return sweet
+
+
+# ------------------ STOCK HISTORY (ADMIN ONLY) ------------------
+@router.get("/{sweet_id}/movements", response_model=list[schemas.StockMovementResponse])
+async def list_stock_movements(
+    sweet_id: int,
+    before_id: int | None = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db),
+    _: CurrentUser = Depends(get_current_admin)
+):
+    # Newest first; pass the last id seen as before_id for the next page
+    query = select(models.StockMovement).where(models.StockMovement.sweet_id == sweet_id)
+    if before_id is not None:
+        query = query.where(models.StockMovement.id < before_id)
+    query = query.order_by(models.StockMovement.id.desc()).limit(limit)
+    return (await db.scalars(query)).all()
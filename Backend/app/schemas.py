@@ -1,4 +1,6 @@
-from pydantic import BaseModel, ConfigDict, EmailStr, Field
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, EmailStr, Field, model_validator
 
 
 class UserCreate(BaseModel):
@@ -36,3 +38,82 @@ class SweetResponse(SweetBase):
     id: int
 
     model_config = ConfigDict(from_attributes=True)
+
+class CartItem(BaseModel):
+    sweet_id: int
+    quantity: int = Field(1, gt=0)
+
+class CheckoutRequest(BaseModel):
+    items: list[CartItem] = Field(..., min_length=1, max_length=100)
+
+class ImportRowError(BaseModel):
+    line: int
+    error: str
+
+class ImportReport(BaseModel):
+    rows: int
+    written: int
+    error_count: int
+    errors: list[ImportRowError]
+    seconds: float
+    rows_per_second: float
+    failed_at_line: int | None = None
+
+class StockMovementResponse(BaseModel):
+    id: int
+    sweet_id: int
+    delta: int
+    reason: str
+    user_id: int | None
+    created_at: datetime
+
+    model_config = ConfigDict(from_attributes=True)
+
+class CategoryFacet(BaseModel):
+    category: str
+    sweet_count: int
+    total_quantity: int
+    stock_value: float
+    min_price: float | None
+    max_price: float | None
+
+    model_config = ConfigDict(from_attributes=True)
+
+class Facets(BaseModel):
+    categories: list[CategoryFacet]
+    sweet_count: int
+    total_quantity: int
+    stock_value: float
+
+class BatchFilter(BaseModel):
+    """Which sweets a batch applies to: listed ids, a category, or both (AND)."""
+    ids: list[int] | None = Field(None, min_length=1, max_length=10000)
+    category: str | None = Field(None, min_length=1)
+
+    @model_validator(mode="after")
+    def require_filter(self):
+        # Never touch the whole catalog by accident
+        if self.ids is None and self.category is None:
+            raise ValueError("Give ids, a category, or both")
+        return self
+
+class BatchChanges(BaseModel):
+    category: str | None = Field(None, min_length=1, max_length=50)
+    price: float | None = Field(None, gt=0)
+    quantity: int | None = Field(None, ge=0)
+
+class BatchUpdate(BatchFilter):
+    changes: BatchChanges
+
+class BatchRestock(BatchFilter):
+    amount: int = Field(..., gt=0)
+
+class Suggestion(BaseModel):
+    id: int
+    name: str
+    category: str
+    quantity: int
+
+class StreamToken(BaseModel):
+    token: str
+    expires_in: int
@@ -0,0 +1,105 @@
+import logging
+
+from sqlalchemy import column, func, literal_column, table, text
+from sqlalchemy.exc import DBAPIError
+
+from app import models
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "sweets_fts"
+# Trigram indexes can't answer substrings shorter than one trigram
+MIN_INDEXED_LENGTH = 3
+
+# Which index search_sweets can use: "fts5", "trgm" or None (plain LIKE)
+backend = None
+
+sweets_fts = table(FTS_TABLE, column("rowid"), column("rank"))
+
+SQLITE_DDL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, category, content='sweets', content_rowid='id', tokenize='trigram'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS sweets_fts_ai AFTER INSERT ON sweets BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS sweets_fts_ad AFTER DELETE ON sweets BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS sweets_fts_au AFTER UPDATE OF name, category ON sweets BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, category) VALUES ('delete', old.id, old.name, old.category);
+        INSERT INTO {FTS_TABLE}(rowid, name, category) VALUES (new.id, new.name, new.category);
+    END""",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_name_trgm ON sweets USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_sweets_category_trgm ON sweets USING gin (category gin_trgm_ops)",
+]
+
+
+def install(engine):
+    """Create the search index for ``engine``'s dialect if it's missing.
+
+    SQLite gets an FTS5 trigram table kept in sync by triggers, Postgres gets
+    pg_trgm GIN indexes. Anything else (or a failure) leaves search on LIKE.
+    """
+    global backend
+    dialect = engine.dialect.name
+    try:
+        with engine.begin() as conn:
+            if dialect == "sqlite":
+                exists = conn.execute(
+                    text("SELECT 1 FROM sqlite_master WHERE name = :name"), {"name": FTS_TABLE}
+                ).first()
+                for ddl in SQLITE_DDL:
+                    conn.exec_driver_sql(ddl)
+                if not exists:
+                    conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                backend = "fts5"
+            elif dialect == "postgresql":
+                for ddl in POSTGRES_DDL:
+                    conn.exec_driver_sql(ddl)
+                backend = "trgm"
+    except DBAPIError:
+        logger.warning("Search index unavailable on %s, falling back to LIKE", dialect, exc_info=True)
+        backend = None
+
+
+def _fts_phrase(field: str, term: str) -> str:
+    escaped = term.replace('"', '""')
+    return f'{field} : "{escaped}"'
+
+
+def text_search(query, name: str | None, category: str | None):
+    """Filter ``query`` to sweets whose name/category contain the given text.
+
+    Returns ``(query, rank)`` where ``rank`` sorts best matches first, or
+    None when no index is involved.
+    """
+    terms = {field: term for field, term in (("name", name), ("category", category)) if term}
+    if not terms:
+        return query, None
+
+    if backend == "fts5":
+        phrases = [_fts_phrase(f, t) for f, t in terms.items() if len(t) >= MIN_INDEXED_LENGTH]
+        short = {f: t for f, t in terms.items() if len(t) < MIN_INDEXED_LENGTH}
+        for field, term in short.items():
+            query = query.where(getattr(models.Sweet, field).ilike(f"%{term}%"))
+        if not phrases:
+            return query, None
+        query = query.join(sweets_fts, sweets_fts.c.rowid == models.Sweet.id).where(
+            literal_column(FTS_TABLE).op("MATCH")(" AND ".join(phrases))
+        )
+        # bm25 rank, lower is better
+        return query, sweets_fts.c.rank
+
+    rank = None
+    for field, term in terms.items():
+        col = getattr(models.Sweet, field)
+        query = query.where(col.ilike(f"%{term}%"))
+        if backend == "trgm":
+            score = -func.similarity(col, term)
+            rank = score if rank is None else rank + score
+    return query, rank
@@ -1,20 +1,31 @@
 import os
+import time
 from datetime import datetime, timedelta
+from typing import NamedTuple
 
 from dotenv import load_dotenv
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models
-from app.db import get_db
+from app.cache import TTLCache
+from app.db import get_async_db
 
 load_dotenv()
 
 SECRET_KEY = os.getenv("JWT_SECRET", "secretkeyyyy")
 ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 10000))
+# Seconds a resolved user is trusted before the role is read again; role changes
+# and deletions made outside this process (psql, scripts, other workers) show up after this
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", 30))
+# Lifetime of the query-string tokens that open a stock feed stream
+STREAM_TOKEN_EXPIRE_SECONDS = int(os.getenv("STREAM_TOKEN_EXPIRE_SECONDS", 60))
+STREAM_SCOPE = "stream"
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -24,23 +35,85 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None):
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    credentials_exception = HTTPException(
+
+class CurrentUser(NamedTuple):
+    id: int
+    username: str
+    role: str
+
+
+# Verified token -> CurrentUser, each entry lives until the token's exp or AUTH_CACHE_TTL, whichever is first
+user_cache = TTLCache(maxsize=AUTH_CACHE_SIZE)
+
+
+def invalidate_user(user_id: int):
+    user_cache.discard_where(lambda user: user.id == user_id)
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _drop_cached_user(mapper, connection, target):
+    invalidate_user(target.id)
+
+
+def _credentials_exception():
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+
+async def _resolve_user(token: str, db: AsyncSession, scope: str | None) -> tuple[CurrentUser, dict]:
+    """Decode ``token``, which must carry ``scope``, and load its user."""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise _credentials_exception()
+    username: str = payload.get("sub")
+    if username is None or payload.get("scope") != scope:
+        raise _credentials_exception()
 
-    user = db.query(models.User).filter(models.User.username == username).first()
-    if user is None:
-        raise credentials_exception
+    db_user = await db.scalar(select(models.User).where(models.User.username == username))
+    # Done with this session, don't hold a connection for the rest of the request
+    await db.close()
+    if db_user is None:
+        raise _credentials_exception()
+    return CurrentUser(id=db_user.id, username=db_user.username, role=db_user.role), payload
+
+
+# Users are resolved from the primary: a replica may not have a just-registered
+# user yet, and hits are served from user_cache anyway
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+
+    # Access tokens carry no scope, so a stream token can't stand in for one
+    user, payload = await _resolve_user(token, db, scope=None)
+    user_cache.set(token, user, expires_at=min(payload["exp"], time.time() + AUTH_CACHE_TTL))
     return user
 
+
+# ------------------ STREAM TOKENS ------------------
+# EventSource can't send an Authorization header, so the stock feed also takes
+# a short-lived token in the query string, good for nothing but opening a stream
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+
+
+def create_stream_token(user: CurrentUser) -> str:
+    return create_access_token(
+        {"sub": user.username, "scope": STREAM_SCOPE}, timedelta(seconds=STREAM_TOKEN_EXPIRE_SECONDS)
+    )
+
+
+async def get_stream_user(
+    token: str | None = Query(None),
+    bearer: str | None = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db),
+):
+    if token:
+        return (await _resolve_user(token, db, scope=STREAM_SCOPE))[0]
+    if bearer:
+        return await get_current_user(bearer, db)
+    raise _credentials_exception()
@@ -0,0 +1,130 @@
+import asyncio
+import os
+import uuid
+from collections import OrderedDict, deque
+
+import orjson
+
+# Recent events kept for clients resuming with Last-Event-ID
+FEED_HISTORY = int(os.getenv("FEED_HISTORY", 1000))
+# Distinct sweets a subscriber may have pending before it is told to resync
+FEED_QUEUE_SIZE = int(os.getenv("FEED_QUEUE_SIZE", 256))
+# Seconds between keepalive comments on an idle stream
+FEED_KEEPALIVE = float(os.getenv("FEED_KEEPALIVE", 15))
+
+# A "reset" tells the client it missed events and should reload the catalog
+RESET = object()
+
+
+class Subscription:
+    """One client's pending events, at most one per sweet (newest wins)."""
+
+    __slots__ = ("pending", "reset", "ready")
+
+    def __init__(self):
+        self.pending: OrderedDict[int, tuple[int, bytes]] = OrderedDict()  # sweet_id -> (seq, payload)
+        self.reset = False
+        self.ready = asyncio.Event()
+
+    def push(self, seq: int, sweet_id: int, payload: bytes):
+        if self.reset:
+            return
+        # Re-inserted at the end, so pending events stay in sequence order
+        self.pending.pop(sweet_id, None)
+        self.pending[sweet_id] = (seq, payload)
+        if len(self.pending) > FEED_QUEUE_SIZE:
+            self.overflow()
+        self.ready.set()
+
+    def overflow(self):
+        self.pending.clear()
+        self.reset = True
+        self.ready.set()
+
+
+class StockFeed:
+    """In-process pub/sub of stock changes.
+
+    Events carry ids of the form ``<boot>-<seq>``; a client resuming with an
+    id from another process or an expired one gets a reset instead of a
+    silent gap. Only changes made by this process are seen.
+    """
+
+    def __init__(self, history: int = FEED_HISTORY):
+        self.boot = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.history: deque[tuple[int, int, bytes]] = deque(maxlen=history)  # (seq, sweet_id, payload)
+        self.subscribers: set[Subscription] = set()
+        # In-process consumers, called as listener(sweet_id, quantity, deleted)
+        self.listeners: list = []
+
+    def event_id(self, seq: int) -> str:
+        return f"{self.boot}-{seq}"
+
+    def publish(self, sweet_id: int, quantity: int | None = None, price: float | None = None,
+                deleted: bool = False):
+        self.seq += 1
+        payload = orjson.dumps({"id": sweet_id, "quantity": quantity, "price": price, "deleted": deleted})
+        self.history.append((self.seq, sweet_id, payload))
+        for subscription in self.subscribers:
+            subscription.push(self.seq, sweet_id, payload)
+        for listener in self.listeners:
+            listener(sweet_id, quantity, deleted)
+
+    def publish_sweet(self, sweet):
+        self.publish(sweet.id, sweet.quantity, sweet.price)
+
+    def publish_reset(self):
+        """For bulk changes: every subscriber reloads instead of getting one event per row."""
+        self.seq += 1
+        self.history.clear()
+        for subscription in self.subscribers:
+            subscription.overflow()
+
+    def subscribe(self, last_event_id: str | None = None) -> Subscription:
+        subscription = Subscription()
+        if last_event_id:
+            boot, _, seq = last_event_id.partition("-")
+            oldest = self.history[0][0] if self.history else self.seq + 1
+            if boot != self.boot or not seq.isdigit() or not oldest - 1 <= int(seq) <= self.seq:
+                subscription.overflow()
+            else:
+                for event_seq, sweet_id, payload in self.history:
+                    if event_seq > int(seq):
+                        subscription.push(event_seq, sweet_id, payload)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    async def next_batch(self, subscription: Subscription, timeout: float = FEED_KEEPALIVE):
+        """Wait for events; returns ``[(event_id, payload or RESET)]``, empty on timeout."""
+        if not subscription.pending and not subscription.reset:
+            subscription.ready.clear()
+            try:
+                await asyncio.wait_for(subscription.ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return []
+        if subscription.reset:
+            subscription.reset = False
+            subscription.pending.clear()
+            return [(self.event_id(self.seq), RESET)]
+        batch = [(self.event_id(seq), payload) for seq, payload in subscription.pending.values()]
+        subscription.pending.clear()
+        return batch
+
+
+stock_feed = StockFeed()
+
+
+def format_sse(batch) -> bytes:
+    if not batch:
+        return b": keepalive\n\n"
+    lines = []
+    for event_id, payload in batch:
+        if payload is RESET:
+            lines.append(f"id: {event_id}\nevent: reset\ndata: {{}}\n\n".encode())
+        else:
+            lines.append(f"id: {event_id}\nevent: stock\ndata: ".encode() + payload + b"\n\n")
+    return b"".join(lines)
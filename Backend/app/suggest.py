@@ -0,0 +1,161 @@
+"""In-memory prefix index of sweet names and categories for typeahead.
+
+Keys (lowercased names and categories) live in one sorted list with a
+parallel array of sweet ids, ordered by ``(key, id)``; a prefix is the
+slice between two bisects. Built lazily on the first suggest request,
+then kept current by the write handlers and by stock feed events, so it
+only sees this process's writes (and a bulk import triggers a rebuild).
+"""
+import asyncio
+import heapq
+import os
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app import models
+from app.stock_feed import stock_feed
+
+# Longest run of matching keys ranked exhaustively; wider (1-2 letter) prefixes
+# rank only the first SUGGEST_SCAN_LIMIT matches in key order
+SUGGEST_SCAN_LIMIT = int(os.getenv("SUGGEST_SCAN_LIMIT", 2000))
+
+_END = "\U0010ffff"
+
+
+def _keys(name: str, category: str) -> tuple[str, str]:
+    # Many sweets share a category, intern it so they share one string
+    return name.lower(), sys.intern(category.lower())
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.keys: list[str] = []
+        self.ids = array("q")
+        self.sweets: dict[int, tuple[str, str, int]] = {}  # id -> (name, category, quantity)
+        self.ready = False
+        self._build_lock = asyncio.Lock()
+        self._building = False
+        self._queued: list[tuple] = []  # changes seen while a build was running
+        self._generation = 0  # bumped by invalidate(), so a build racing an import is redone
+
+    # ------------------ building ------------------
+    def load(self, rows):
+        """Replace the index with ``rows`` of (id, name, category, quantity)."""
+        sweets, entries = {}, []
+        for sweet_id, name, category, quantity in rows:
+            sweets[sweet_id] = (name, category, quantity or 0)
+            entries.extend((key, sweet_id) for key in _keys(name, category))
+        entries.sort()
+        self.keys = [key for key, _ in entries]
+        self.ids = array("q", (sweet_id for _, sweet_id in entries))
+        self.sweets = sweets
+
+    async def ensure_built(self, sessionmaker):
+        if self.ready:
+            return
+        async with self._build_lock:
+            self._building = True
+            try:
+                while not self.ready:
+                    await self._build(sessionmaker)
+            finally:
+                self._building = False
+                self._queued.clear()
+
+    async def _build(self, sessionmaker):
+        generation = self._generation
+        async with sessionmaker() as db:
+            rows = (
+                await db.execute(
+                    select(models.Sweet.id, models.Sweet.name, models.Sweet.category, models.Sweet.quantity)
+                )
+            ).all()
+        # Sorting a large catalog takes a while, keep it off the event loop
+        fresh = SuggestIndex()
+        await run_in_threadpool(fresh.load, rows)
+        if generation != self._generation:
+            return
+        self.keys, self.ids, self.sweets = fresh.keys, fresh.ids, fresh.sweets
+        self.ready = True
+        queued, self._queued = self._queued, []
+        for method, *args in queued:
+            getattr(self, method)(*args)
+
+    def invalidate(self):
+        """Drop everything; the next suggest request rebuilds from the database."""
+        self.ready = False
+        self._generation += 1
+        self._queued.clear()
+        self.keys, self.ids, self.sweets = [], array("q"), {}
+
+    # ------------------ incremental updates ------------------
+    def _defer(self, *change) -> bool:
+        """Before the first build there is nothing to update; during one, replay after it."""
+        if self.ready:
+            return False
+        if self._building:
+            self._queued.append(change)
+        return True
+
+    def _insert(self, key: str, sweet_id: int):
+        lo, hi = bisect_left(self.keys, key), bisect_right(self.keys, key)
+        i = bisect_left(self.ids, sweet_id, lo, hi)
+        self.keys.insert(i, key)
+        self.ids.insert(i, sweet_id)
+
+    def _delete(self, key: str, sweet_id: int):
+        lo, hi = bisect_left(self.keys, key), bisect_right(self.keys, key)
+        i = bisect_left(self.ids, sweet_id, lo, hi)
+        if i < hi and self.ids[i] == sweet_id:
+            del self.keys[i]
+            del self.ids[i]
+
+    def upsert(self, sweet_id: int, name: str, category: str, quantity: int | None):
+        if self._defer("upsert", sweet_id, name, category, quantity):
+            return
+        old = self.sweets.get(sweet_id)
+        if old is not None and _keys(*old[:2]) != _keys(name, category):
+            self.remove(sweet_id)
+            old = None
+        if old is None:
+            for key in _keys(name, category):
+                self._insert(key, sweet_id)
+        self.sweets[sweet_id] = (name, category, quantity or 0)
+
+    def remove(self, sweet_id: int):
+        if self._defer("remove", sweet_id):
+            return
+        old = self.sweets.pop(sweet_id, None)
+        if old is not None:
+            for key in _keys(*old[:2]):
+                self._delete(key, sweet_id)
+
+    def on_stock_change(self, sweet_id: int, quantity: int | None, deleted: bool):
+        if self._defer("on_stock_change", sweet_id, quantity, deleted):
+            return
+        if deleted:
+            self.remove(sweet_id)
+        elif sweet_id in self.sweets:
+            name, category, _ = self.sweets[sweet_id]
+            self.sweets[sweet_id] = (name, category, quantity or 0)
+
+    # ------------------ lookups ------------------
+    def suggest(self, prefix: str, limit: int = 10) -> list[dict]:
+        """Sweets whose name or category starts with ``prefix``, most stock first."""
+        prefix = prefix.lower()
+        lo = bisect_left(self.keys, prefix)
+        hi = min(bisect_left(self.keys, prefix + _END, lo), lo + SUGGEST_SCAN_LIMIT)
+        sweets = self.sweets
+        candidates = set(self.ids[lo:hi])
+        best = heapq.nsmallest(limit, candidates, key=lambda i: (-sweets[i][2], sweets[i][0], i))
+        return [
+            {"id": i, "name": sweets[i][0], "category": sweets[i][1], "quantity": sweets[i][2]} for i in best
+        ]
+
+
+suggest_index = SuggestIndex()
+stock_feed.listeners.append(suggest_index.on_stock_change)
@@ -1,9 +1,53 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi import HTTPException, status
 from passlib.context import CryptContext
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", os.cpu_count() or 2))
+HASH_QUEUE_SIZE = int(os.getenv("HASH_QUEUE_SIZE", 32))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
+
+
+# ------------------ HASHING POOL ------------------
+# bcrypt releases the GIL, so a small dedicated thread pool keeps hashing off
+# the event loop and away from the default pool used by the rest of the app.
+# Workers plus queue are capped: once full, new requests fail fast with 503.
+_hash_pool = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_hash_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_SIZE)
+
+
+async def _run_hasher(fn, *args):
+    if not _hash_slots.acquire(blocking=False):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, try again",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(_hash_pool, fn, *args)
+    finally:
+        _hash_slots.release()
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_hasher(hash_password, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Verify a password, returning ``(ok, new_hash)``.
+
+    ``new_hash`` is set when the stored hash uses an outdated cost factor
+    and should be saved in place of the old one.
+    """
+    return await _run_hasher(pwd_context.verify_and_update, plain_password, hashed_password)
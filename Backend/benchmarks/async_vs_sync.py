@@ -0,0 +1,106 @@
+"""Compare sync (thread pool) and async DB throughput at high concurrency.
+
+Runs the same catalog read through a sync engine behind a 40-thread pool
+(Starlette's default) and through the async engine with ``asyncio.gather``.
+The async pool is sized separately (``--async-pool-size``); both runs
+report the mean time a request waited for a connection.
+
+    python -m benchmarks.async_vs_sync --requests 5000 --concurrency 1000 --async-pool-size 200
+
+Uses DATABASE_URL when set, otherwise a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import models  # noqa: E402
+from app.db import to_async_url  # noqa: E402
+
+THREADPOOL_SIZE = 40
+
+
+def seed(url: str, rows: int):
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        if conn.scalar(select(models.Sweet.id).limit(1)) is None:
+            conn.execute(
+                models.Sweet.__table__.insert(),
+                [{"name": f"bench-{i}", "category": "Bench", "price": 1.0, "quantity": 10} for i in range(rows)],
+            )
+    engine.dispose()
+
+
+def run_sync(url: str, requests: int):
+    """Returns ``(elapsed, total seconds spent waiting for a pooled connection)``."""
+    engine = create_engine(url, pool_size=THREADPOOL_SIZE)
+    query = select(models.Sweet).limit(50)
+    waits = []
+
+    def one(_):
+        asked = time.perf_counter()
+        with engine.connect() as conn:
+            waits.append(time.perf_counter() - asked)
+            return conn.execute(query).all()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+    engine.dispose()
+    return elapsed, sum(waits)
+
+
+async def run_async(url: str, requests: int, concurrency: int, pool_size: int):
+    """Returns ``(elapsed, total seconds spent waiting for a pooled connection)``."""
+    engine = create_async_engine(to_async_url(url), pool_size=pool_size, max_overflow=0, pool_timeout=300)
+    query = select(models.Sweet).limit(50)
+    gate = asyncio.Semaphore(concurrency)
+    waits = []
+
+    async def one():
+        async with gate:
+            asked = time.perf_counter()
+            async with engine.connect() as conn:
+                waits.append(time.perf_counter() - asked)
+                return (await conn.execute(query)).all()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return elapsed, sum(waits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--async-pool-size", type=int, default=200,
+                        help="connections for the async run; keep under the server's max_connections")
+    args = parser.parse_args()
+
+    url = os.environ["DATABASE_URL"]
+    seed(url, args.rows)
+
+    sync_s, sync_wait = run_sync(url, args.requests)
+    async_s, async_wait = asyncio.run(run_async(url, args.requests, args.concurrency, args.async_pool_size))
+
+    print(f"sync  ({THREADPOOL_SIZE} threads, {THREADPOOL_SIZE} connections): {args.requests / sync_s:10.1f} req/s,"
+          f" pool wait {sync_wait / args.requests * 1000:.2f} ms/request")
+    print(f"async ({args.concurrency} in flight, {args.async_pool_size} connections):"
+          f" {args.requests / async_s:10.1f} req/s, pool wait {async_wait / args.requests * 1000:.2f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Reprice N sweets: N x PATCH /api/sweets/{id} vs one POST /api/sweets/batch/update.
+
+    python -m benchmarks.batch_update --count 10000 --concurrency 4
+
+Drives the app in-process over ASGI. Uses DATABASE_URL when set, otherwise
+a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import models  # noqa: E402
+from app.db import AsyncSessionLocal, async_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.security import create_access_token  # noqa: E402
+
+
+async def seed(category: str, count: int) -> list[int]:
+    async with AsyncSessionLocal() as db:
+        sweets = [models.Sweet(name=f"{category}-{i}", category=category, price=1.0, quantity=10) for i in range(count)]
+        db.add_all(sweets)
+        db.add(models.User(username=f"admin_{category}", email=f"{category}@bench.com", hashed_password="x", role="admin"))
+        await db.commit()
+        return [sweet.id for sweet in sweets]
+
+
+async def run(count: int, concurrency: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label in ("per-item PATCH", "batch update"):
+            category = f"bench-{uuid.uuid4().hex[:8]}"
+            ids = await seed(category, count)
+            headers = {"Authorization": f"Bearer {create_access_token({'sub': f'admin_{category}'})}"}
+            start = time.perf_counter()
+            if label == "batch update":
+                response = await client.post(
+                    "/api/sweets/batch/update", headers=headers, json={"category": category, "changes": {"price": 2.0}}
+                )
+                assert response.status_code == 200 and len(response.json()) == count
+            else:
+                gate = asyncio.Semaphore(concurrency)
+
+                async def patch(sweet_id):
+                    async with gate:
+                        response = await client.patch(f"/api/sweets/{sweet_id}", headers=headers, json={"price": 2.0})
+                        assert response.status_code == 200, response.text
+
+                await asyncio.gather(*(patch(sweet_id) for sweet_id in ids))
+            elapsed = time.perf_counter() - start
+            print(f"{label:16} {elapsed:8.2f}s  {count / elapsed:10.0f} sweets/s")
+
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=10_000)
+    # SQLite has one writer; many concurrent PATCHes just queue on its lock (or time out)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    asyncio.run(run(args.count, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Peak RSS growth while streaming a full catalog export.
+
+    python -m benchmarks.export_memory --rows 1000000 --max-rss-mb 64
+
+Seeds the catalog, then reads GET /api/sweets/export in-process and exits
+non-zero if RSS grew by more than the budget. Uses DATABASE_URL when set,
+otherwise a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+import uuid
+
+import httpx
+from sqlalchemy import create_engine
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app.db import async_engine  # noqa: E402
+from app.main import app  # noqa: E402
+from benchmarks.pagination import seed  # noqa: E402
+
+
+def rss_mb() -> float:
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def export(format: str):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        admin = {"username": f"bench_{uuid.uuid4().hex[:8]}", "password": "Bench1234!", "role": "admin"}
+        await client.post("/api/auth/register", json={**admin, "email": f"{admin['username']}@bench.com"})
+        token = (await client.post("/api/auth/login", data=admin)).json()["access_token"]
+
+    # httpx's ASGI transport buffers whole bodies, so talk ASGI directly and
+    # drop each chunk as soon as it arrives
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/sweets/export",
+        "raw_path": b"/api/sweets/export",
+        "query_string": f"format={format}".encode(),
+        "root_path": "",
+        "headers": [(b"host", b"bench"), (b"authorization", f"Bearer {token}".encode())],
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    counts = {"lines": 0, "bytes": 0}
+    requested = asyncio.Event()
+
+    async def receive():
+        # one empty request body, then a client that never disconnects
+        if requested.is_set():
+            await asyncio.Event().wait()
+        requested.set()
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            counts["lines"] += body.count(b"\n")
+            counts["bytes"] += len(body)
+
+    before = rss_mb()
+    start = time.perf_counter()
+    await app(scope, receive, send)
+    elapsed = time.perf_counter() - start
+    growth = rss_mb() - before
+    await async_engine.dispose()
+    return counts["lines"], counts["bytes"], elapsed, growth
+
+
+def seed_catalog(rows: int):
+    seed(create_engine(os.environ["DATABASE_URL"]), rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--max-rss-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    # Seed in a child process so its memory doesn't count toward our peak
+    seeder = multiprocessing.Process(target=seed_catalog, args=(args.rows,))
+    seeder.start()
+    seeder.join()
+
+    lines, size, elapsed, growth = asyncio.run(export(args.format))
+    print(
+        f"{lines} lines, {size / 1e6:.1f} MB in {elapsed:.1f}s "
+        f"({lines / elapsed:.0f} rows/s), peak RSS growth {growth:.1f} MB"
+    )
+    if growth > args.max_rss_mb:
+        sys.exit(f"RSS grew {growth:.1f} MB, budget is {args.max_rss_mb} MB")
+
+
+if __name__ == "__main__":
+    main()
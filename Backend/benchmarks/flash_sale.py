@@ -0,0 +1,75 @@
+"""Flash-sale purchases: one commit per purchase vs group commit per sweet.
+
+    python -m benchmarks.flash_sale --purchases 5000 --concurrency 500
+
+Every purchase targets the same sweet. Uses DATABASE_URL when set,
+otherwise a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import models  # noqa: E402
+from app.db import AsyncSessionLocal, async_engine  # noqa: E402
+from app.flash_sale import PurchaseBatcher  # noqa: E402
+from benchmarks.hot_sku import purchase  # noqa: E402
+
+
+async def new_sweet(quantity: int) -> int:
+    async with AsyncSessionLocal() as db:
+        sweet = models.Sweet(name=f"flash-{time.time_ns()}", category="Bench", price=1.0, quantity=quantity)
+        db.add(sweet)
+        await db.commit()
+        return sweet.id
+
+
+async def timed(buy, purchases: int, concurrency: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            return await buy()
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(purchases)))
+    assert all(results), "ran out of stock mid-benchmark"
+    return time.perf_counter() - start
+
+
+async def bench(purchases: int, concurrency: int, window_ms: float, max_batch: int):
+    sweet_id = await new_sweet(purchases)
+    elapsed = await timed(lambda: purchase(sweet_id, with_ledger=True), purchases, concurrency)
+    print(f"{'per-request commit':20} {purchases / elapsed:8.1f} purchases/s {purchases / elapsed:8.1f} commits/s")
+
+    batcher = PurchaseBatcher(window_ms=window_ms, max_batch=max_batch)
+    sweet_id = await new_sweet(purchases)
+    elapsed = await timed(lambda: batcher.purchase(sweet_id, None), purchases, concurrency)
+    stats = batcher.stats()
+    print(
+        f"{'group commit':20} {purchases / elapsed:8.1f} purchases/s {stats['commits'] / elapsed:8.1f} commits/s"
+        f"  (mean batch {stats['mean_batch_size']:.1f})"
+    )
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--purchases", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=500)
+    parser.add_argument("--window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=200)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=create_engine(os.environ["DATABASE_URL"]))
+    asyncio.run(bench(args.purchases, args.concurrency, args.window_ms, args.max_batch))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Hot-SKU purchase throughput: stock UPDATE alone vs UPDATE plus ledger row.
+
+    python -m benchmarks.hot_sku --purchases 5000 --concurrency 100
+
+Every purchase targets the same sweet. Uses DATABASE_URL when set,
+otherwise a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from sqlalchemy import create_engine
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import models  # noqa: E402
+from app.crud import change_stock, record_movements  # noqa: E402
+from app.db import AsyncSessionLocal, async_engine  # noqa: E402
+
+
+async def purchase(sweet_id: int, with_ledger: bool) -> bool:
+    async with AsyncSessionLocal() as db:
+        sweet = await change_stock(db, sweet_id, -1)
+        if sweet is not None and with_ledger:
+            await record_movements(db, {sweet_id: -1}, "purchase", None)
+        await db.commit()
+        return sweet is not None
+
+
+async def run(sweet_id: int, purchases: int, concurrency: int, with_ledger: bool) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with gate:
+            return await purchase(sweet_id, with_ledger)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(one() for _ in range(purchases)))
+    elapsed = time.perf_counter() - start
+    assert all(results), "ran out of stock mid-benchmark"
+    return purchases / elapsed
+
+
+async def bench(purchases: int, concurrency: int):
+    for with_ledger in (False, True):
+        async with AsyncSessionLocal() as db:
+            sweet = models.Sweet(name=f"hot-{with_ledger}-{time.time_ns()}", category="Bench", price=1.0, quantity=purchases)
+            db.add(sweet)
+            await db.commit()
+        rate = await run(sweet.id, purchases, concurrency, with_ledger)
+        label = "update + ledger" if with_ledger else "update only"
+        print(f"{label:16} {rate:8.1f} purchases/s")
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--purchases", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    models.Base.metadata.create_all(bind=create_engine(os.environ["DATABASE_URL"]))
+    asyncio.run(bench(args.purchases, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
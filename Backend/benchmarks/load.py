@@ -0,0 +1,212 @@
+"""Load test: throughput and p50/p95/p99 latency per request mix.
+
+    python -m benchmarks.load --scale 100k --out results.json
+    python -m benchmarks.load --scale 100k --baseline results.json
+
+Always runs on a local SQLite file (``--db``, reused between runs so the
+catalog is only seeded once) and drives the app in-process over ASGI, so
+no network or database server is involved. With ``--baseline`` the run is
+compared to a stored result and exits non-zero when any mix lost more than
+``--threshold`` of its throughput or its p95 grew by more than that.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import httpx
+
+SCALES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+PASSWORD = "Bench1234!"
+
+# Relative weights of each request in the "mixed" scenario
+MIXED = {"list": 60, "search": 25, "purchase": 10, "restock": 3, "login": 2}
+
+# Login throttle bursts during a run
+UNLIMITED = 10**9
+
+
+def parse_scale(value: str) -> int:
+    return SCALES.get(value.lower()) or int(value)
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def summarize(latencies: list[float], errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / seconds, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+    }
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Describe every mix that regressed by more than ``threshold`` against ``baseline``."""
+    regressions = []
+    for mix, base in baseline["results"].items():
+        current = results["results"].get(mix)
+        if current is None:
+            continue
+        if current["rps"] < base["rps"] * (1 - threshold):
+            regressions.append(f"{mix}: {current['rps']} req/s vs baseline {base['rps']}")
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            regressions.append(f"{mix}: p95 {current['p95_ms']}ms vs baseline {base['p95_ms']}ms")
+    return regressions
+
+
+def seed(rows: int, users: int):
+    from sqlalchemy import func, select, update
+
+    from app import models
+    from app.db import engine
+    from app.utils import hash_password
+    from benchmarks.pagination import seed as seed_catalog
+
+    seed_catalog(engine, rows)
+    with engine.begin() as conn:
+        # Plenty of stock, so purchases never start failing mid-run
+        conn.execute(update(models.Sweet).values(quantity=1_000_000_000))
+        have = conn.scalar(select(func.count()).select_from(models.User).where(models.User.username.like("load_%")))
+        if have < users:
+            hashed = hash_password(PASSWORD)
+            conn.execute(
+                models.User.__table__.insert(),
+                [
+                    {"username": f"load_{i}", "email": f"load_{i}@bench.com", "hashed_password": hashed,
+                     "role": "admin" if i == 0 else "user"}
+                    for i in range(have, users)
+                ],
+            )
+        ids = conn.execute(select(func.min(models.Sweet.id), func.max(models.Sweet.id))).one()
+    return ids
+
+
+async def run(args, sweet_ids):
+    from app import rate_limit
+    from app.db import async_engine
+    from app.main import app
+    from app.security import create_access_token
+
+    # Every request comes from one client address, measure logins rather than the throttle
+    rate_limit.AUTH_USER_BURST = rate_limit.AUTH_IP_BURST = UNLIMITED
+
+    low, high = sweet_ids
+    rows = high - low + 1
+    users = [f"load_{i}" for i in range(args.users)]
+    tokens = {name: {"Authorization": f"Bearer {create_access_token({'sub': name})}"} for name in users}
+    admin = tokens["load_0"]
+
+    def login(client, rng):
+        return client.post("/api/auth/login", data={"username": rng.choice(users), "password": PASSWORD})
+
+    def list_page(client, rng):
+        sort = rng.choice(["id", "price", "name"])
+        return client.get(f"/api/sweets/?sort={sort}&skip={rng.randrange(min(rows, 1000))}&limit=50",
+                          headers=tokens[rng.choice(users)])
+
+    def search(client, rng):
+        return client.get(f"/api/sweets/search?name=bench-{rng.randrange(rows)}", headers=tokens[rng.choice(users)])
+
+    def purchase(client, rng):
+        return client.post(f"/api/sweets/{rng.randint(low, high)}/purchase", headers=tokens[rng.choice(users)])
+
+    def restock(client, rng):
+        return client.post(f"/api/sweets/{rng.randint(low, high)}/restock?amount=5", headers=admin)
+
+    requests = {"login": login, "list": list_page, "search": search, "purchase": purchase, "restock": restock}
+    scenarios = {name: {name: 1} for name in requests} | {"mixed": MIXED}
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for scenario in args.mix:
+            names, weights = zip(*scenarios[scenario].items())
+            latencies, errors = [], 0
+            deadline = time.perf_counter() + args.seconds
+
+            async def worker(seed):
+                nonlocal errors
+                rng = random.Random(seed)
+                while time.perf_counter() < deadline:
+                    request = requests[rng.choices(names, weights)[0]]
+                    start = time.perf_counter()
+                    response = await request(client, rng)
+                    latencies.append(time.perf_counter() - start)
+                    errors += response.status_code >= 400
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(args.seed + i) for i in range(args.concurrency)))
+            results[scenario] = summarize(latencies, errors, time.perf_counter() - start)
+            print(f"{scenario:10} " + "  ".join(f"{key} {value}" for key, value in results[scenario].items()))
+
+    await async_engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", type=parse_scale, default="1k", help="sweets to seed: 1k, 100k, 1m or a number")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5, help="duration of each mix")
+    parser.add_argument("--mix", nargs="+", default=["login", "list", "search", "purchase", "restock", "mixed"],
+                        choices=["login", "list", "search", "purchase", "restock", "mixed"])
+    parser.add_argument("--seed", type=int, default=0, help="random seed, for repeatable request streams")
+    parser.add_argument("--db", help="SQLite file to seed and reuse (default: per-scale file in the temp dir)")
+    parser.add_argument("--out", help="write results as JSON to this file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed regression, as a fraction")
+    args = parser.parse_args()
+
+    db = args.db or os.path.join(tempfile.gettempdir(), f"sweet-shop-load-{args.scale}.db")
+    # Set before the app is imported: app.db reads it at import time
+    os.environ["DATABASE_URL"] = f"sqlite:///{db}"
+    os.environ.pop("ASYNC_DATABASE_URL", None)
+    os.environ.pop("DATABASE_REPLICA_URLS", None)
+
+    import app.main  # noqa: F401  creates the tables and search index
+
+    random.seed(args.seed)
+    sweet_ids = seed(args.scale, args.users)
+    results = {
+        "meta": {
+            "scale": args.scale,
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "seconds": args.seconds,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": asyncio.run(run(args, sweet_ids)),
+    }
+
+    if args.out:
+        with open(args.out, "w") as out:
+            json.dump(results, out, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
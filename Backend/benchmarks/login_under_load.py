@@ -0,0 +1,123 @@
+"""Login throughput and catalog read throughput while logins run in parallel.
+
+    python -m benchmarks.login_under_load --seconds 30 --flood-rate 50
+
+Drives the app in-process over ASGI. Uses DATABASE_URL when set, otherwise
+a throwaway SQLite file. The flood (wrong passwords for ``--victims``
+existing accounts, spread over ``--flood-ips`` client addresses) is run
+with the login throttle switched off and then on. The throttled run spends
+its burst allowances first, so give it long enough to reach steady state.
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+import uuid
+
+import httpx
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import models, rate_limit  # noqa: E402
+from app.db import async_engine, engine  # noqa: E402
+from app.main import app  # noqa: E402
+from app.utils import hash_password  # noqa: E402
+
+UNLIMITED = 10**9
+
+
+async def hammer(client, request, deadline, counts):
+    while time.perf_counter() < deadline:
+        response = await request(client)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+
+async def flood(clients, request, rate, deadline, counts):
+    """Open loop: attempts go out at ``rate`` per second whatever the responses."""
+    async def attempt(client):
+        response = await request(client)
+        counts[response.status_code] = counts.get(response.status_code, 0) + 1
+
+    pending, sent, start = set(), 0, time.perf_counter()
+    while time.perf_counter() < deadline:
+        due = int((time.perf_counter() - start) * rate)
+        for _ in range(due - sent):
+            pending.add(asyncio.ensure_future(attempt(clients[sent % len(clients)])))
+            sent += 1
+        await asyncio.sleep(0.005)
+    await asyncio.gather(*pending)
+
+
+def create_victims(count: int) -> list[str]:
+    prefix = f"victim_{uuid.uuid4().hex[:8]}"
+    hashed = hash_password("Victim1234!")
+    with engine.begin() as conn:
+        conn.execute(
+            models.User.__table__.insert(),
+            [{"username": f"{prefix}_{i}", "email": f"{prefix}_{i}@bench.com", "hashed_password": hashed,
+              "role": "user"} for i in range(count)],
+        )
+    return [f"{prefix}_{i}" for i in range(count)]
+
+
+async def run(seconds: float, read_clients: int, flood_rate: float, flood_ips: int, victims: list[str]):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        user = {"username": f"bench_{uuid.uuid4().hex[:8]}", "password": "Bench1234!"}
+        await client.post("/api/auth/register", json={**user, "email": f"{user['username']}@bench.com"})
+        token = (await client.post("/api/auth/login", data=user)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def read(c):
+            return await c.get("/api/sweets/", headers=headers)
+
+        async def login(c):
+            return await c.post("/api/auth/login", data={"username": random.choice(victims),
+                                                          "password": "guess"})
+
+        attackers = [
+            httpx.AsyncClient(transport=httpx.ASGITransport(app=app, client=(f"10.0.{i // 256}.{i % 256}", 4000)),
+                              base_url="http://bench")
+            for i in range(flood_ips)
+        ]
+        limits = rate_limit.AUTH_USER_BURST, rate_limit.AUTH_IP_BURST
+        for label, flooded, throttled in (
+            ("reads only", False, True), ("flood, no throttle", True, False), ("flood, throttled", True, True)
+        ):
+            rate_limit.AUTH_USER_BURST, rate_limit.AUTH_IP_BURST = limits if throttled else (UNLIMITED, UNLIMITED)
+            rate_limit.auth_limiter.clear()
+            reads, logins = {}, {}
+            deadline = time.perf_counter() + seconds
+            tasks = [hammer(client, read, deadline, reads) for _ in range(read_clients)]
+            if flooded:
+                tasks.append(flood(attackers, login, flood_rate, deadline, logins))
+            await asyncio.gather(*tasks)
+
+            print(
+                f"{label:20} catalog {reads.get(200, 0) / seconds:8.1f} req/s"
+                f" | logins {sum(logins.values()) / seconds:6.1f}/s:"
+                f" 401 {logins.get(401, 0)}, 429 {logins.get(429, 0)}, 503 {logins.get(503, 0)}"
+            )
+
+        for attacker in attackers:
+            await attacker.aclose()
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--read-clients", type=int, default=20)
+    parser.add_argument("--flood-rate", type=float, default=50, help="login attempts per second")
+    parser.add_argument("--flood-ips", type=int, default=1, help="client addresses the flood comes from")
+    parser.add_argument("--victims", type=int, default=100, help="existing accounts the flood guesses at")
+    args = parser.parse_args()
+
+    victims = create_victims(args.victims)
+    asyncio.run(run(args.seconds, args.read_clients, args.flood_rate, args.flood_ips, victims))
+
+if __name__ == "__main__":
+    main()
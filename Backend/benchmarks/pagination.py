@@ -0,0 +1,73 @@
+"""Per-page latency of OFFSET vs keyset pagination at increasing depth.
+
+    python -m benchmarks.pagination --rows 1000000
+
+Seeds a throwaway SQLite catalog (or DATABASE_URL when set) and times one
+page fetch at several depths with each strategy.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app import models  # noqa: E402
+from app.pagination import encode_cursor, keyset  # noqa: E402
+
+PAGE = 50
+BATCH = 50_000
+
+
+def seed(engine, rows: int):
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        have = conn.scalar(select(func.count()).select_from(models.Sweet))
+        for start in range(have, rows, BATCH):
+            conn.execute(
+                models.Sweet.__table__.insert(),
+                [
+                    {"name": f"bench-{i}", "category": "Bench", "price": round(random.uniform(1, 100), 2), "quantity": 10}
+                    for i in range(start, min(start + BATCH, rows))
+                ],
+            )
+
+
+def timed(db: Session, query, repeat: int = 5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        rows = db.scalars(query).all()
+    return (time.perf_counter() - start) / repeat * 1000, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--sort", choices=["id", "price", "name"], default="price")
+    args = parser.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"])
+    seed(engine, args.rows)
+
+    print(f"{'depth':>10} {'offset ms':>10} {'keyset ms':>10}")
+    with Session(engine) as db:
+        for depth in (0, args.rows // 100, args.rows // 10, args.rows // 2, args.rows - PAGE):
+            ordered = keyset(select(models.Sweet), args.sort, None)
+            offset_ms, _ = timed(db, ordered.offset(depth).limit(PAGE))
+
+            # the cursor a client would hold after reading `depth` rows
+            cursor = None
+            if depth:
+                prev = db.scalars(ordered.offset(depth - 1).limit(1)).one()
+                cursor = encode_cursor(args.sort, prev)
+            keyset_ms, _ = timed(db, keyset(select(models.Sweet), args.sort, cursor).limit(PAGE))
+            print(f"{depth:>10} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
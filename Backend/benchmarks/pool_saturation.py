@@ -0,0 +1,71 @@
+"""Checkout latency percentiles as concurrency passes the pool size.
+
+    DB_POOL_SIZE=5 DB_MAX_OVERFLOW=0 python -m benchmarks.pool_saturation --hold-ms 20
+
+Each task checks out a connection, runs a trivial query and holds the
+connection for --hold-ms to stand in for request work. Uses DATABASE_URL
+when set, otherwise a throwaway SQLite file.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+from sqlalchemy import exc, text
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.mkdtemp()}/bench.db")
+
+from app.db import AsyncSessionLocal, async_engine  # noqa: E402
+from app.pool_metrics import engine_stats  # noqa: E402
+
+
+async def one(hold: float):
+    start = time.perf_counter()
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+            await asyncio.sleep(hold)
+    except exc.TimeoutError:
+        return None
+    return time.perf_counter() - start
+
+
+def percentile(values, pct: float) -> float:
+    return statistics.quantiles(values, n=100)[int(pct) - 1] if len(values) > 1 else values[0]
+
+
+async def bench(levels, requests: int, hold: float):
+    pool = async_engine.sync_engine.pool
+    print(f"pool_size={pool.size()} max_overflow={os.getenv('DB_MAX_OVERFLOW', 10)} hold={hold * 1000:.0f}ms")
+    print(f"{'concurrency':>11} {'p50 ms':>8} {'p99 ms':>8} {'timeouts':>8}")
+    for concurrency in levels:
+        gate = asyncio.Semaphore(concurrency)
+
+        async def gated():
+            async with gate:
+                return await one(hold)
+
+        results = await asyncio.gather(*(gated() for _ in range(requests)))
+        latencies = [r * 1000 for r in results if r is not None]
+        timeouts = results.count(None)
+        print(f"{concurrency:>11} {percentile(latencies, 50):>8.1f} {percentile(latencies, 99):>8.1f} {timeouts:>8}")
+    print(engine_stats(async_engine.sync_engine))
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--levels", default="1,2,5,10,15,20,40,80")
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--hold-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    asyncio.run(bench(levels, args.requests, args.hold_ms / 1000))
+
+
+if __name__ == "__main__":
+    main()
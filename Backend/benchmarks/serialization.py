@@ -0,0 +1,72 @@
+"""Per-row cost of building a catalog page: ORM + Pydantic vs Core rows + orjson.
+
+    python -m benchmarks.serialization --rows 50 500
+
+Times query + serialization of one page against an in-memory SQLite catalog,
+so the numbers are CPU only.
+"""
+import argparse
+import os
+import random
+import time
+
+import orjson
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import models, schemas  # noqa: E402
+from app.catalog_cache import RESPONSE_COLUMNS  # noqa: E402
+
+sweet_list = TypeAdapter(list[schemas.SweetResponse])
+
+
+def orm_pydantic(db: Session, rows: int) -> bytes:
+    sweets = db.scalars(select(models.Sweet).limit(rows)).all()
+    body = sweet_list.dump_json(sweet_list.validate_python(sweets, from_attributes=True))
+    db.expunge_all()  # a request gets a fresh session, so no identity-map hits
+    return body
+
+
+def core_orjson(db: Session, rows: int) -> bytes:
+    return orjson.dumps([row._asdict() for row in db.execute(select(*RESPONSE_COLUMNS).limit(rows))])
+
+
+def per_row_us(fn, db: Session, rows: int, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(db, rows)
+    return (time.perf_counter() - start) / repeat / rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.execute(
+            models.Sweet.__table__.insert(),
+            [
+                {"name": f"bench-{i}", "category": "Bench", "price": round(random.uniform(1, 100), 2), "quantity": 10}
+                for i in range(max(args.rows))
+            ],
+        )
+
+    print(f"{'rows':>6} {'orm+pydantic µs/row':>20} {'core+orjson µs/row':>20}")
+    with Session(engine) as db:
+        for rows in args.rows:
+            assert orm_pydantic(db, rows) == core_orjson(db, rows)
+            slow = per_row_us(orm_pydantic, db, rows, args.repeat)
+            fast = per_row_us(core_orjson, db, rows, args.repeat)
+            print(f"{rows:>6} {slow:>20.2f} {fast:>20.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Memory and lookup latency of the typeahead index at catalog scale.
+
+    python -m benchmarks.suggest --names 1000000
+
+Builds app.suggest.SuggestIndex from synthetic names in memory (no
+database) and reports its size, prefix lookup latency by prefix length,
+and the cost of incremental inserts and deletes.
+"""
+import argparse
+import gc
+import os
+import random
+import string
+import time
+import tracemalloc
+
+# app.db needs a DATABASE_URL at import time
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.suggest import SuggestIndex  # noqa: E402
+
+CATEGORIES = [f"Category {i}" for i in range(200)]
+
+
+def synthetic_name(rng: random.Random) -> str:
+    words = ("".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 9))) for _ in range(rng.randint(1, 3)))
+    return " ".join(words).title()
+
+
+def percentile(values, fraction):
+    return sorted(values)[int(fraction * (len(values) - 1))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--names", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    rows = [(i, f"{synthetic_name(rng)} {i}", rng.choice(CATEGORIES), rng.randint(0, 500)) for i in range(args.names)]
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = SuggestIndex()
+    index.load(rows)
+    index.ready = True
+    built = time.perf_counter() - start
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{args.names:,} names: built in {built:.1f}s, {size / 2**20:.0f} MiB ({size / args.names:.0f} B/name)")
+
+    print(f"{'prefix len':>10} {'p50 µs':>8} {'p99 µs':>8}")
+    for length in (1, 2, 3, 5):
+        timings = []
+        for _ in range(args.lookups):
+            name = rng.choice(rows)[1]
+            start = time.perf_counter()
+            index.suggest(name[:length], 10)
+            timings.append((time.perf_counter() - start) * 1e6)
+        print(f"{length:>10} {percentile(timings, 0.5):>8.1f} {percentile(timings, 0.99):>8.1f}")
+
+    new_ids = range(args.names, args.names + 1000)
+    start = time.perf_counter()
+    for i in new_ids:
+        index.upsert(i, synthetic_name(rng), rng.choice(CATEGORIES), 1)
+    inserted = (time.perf_counter() - start) / len(new_ids) * 1e6
+    start = time.perf_counter()
+    for i in new_ids:
+        index.remove(i)
+    removed = (time.perf_counter() - start) / len(new_ids) * 1e6
+    print(f"upsert {inserted:.0f} µs, remove {removed:.0f} µs per sweet")
+
+
+if __name__ == "__main__":
+    main()
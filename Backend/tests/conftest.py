@@ -1,16 +1,29 @@
 import uuid
+from contextlib import contextmanager
 
 import pytest
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
 from app import models
-from app.db import SessionLocal, get_db
+from app.db import SessionLocal, async_engine, engine, get_db
 from app.main import app
 
 
 @pytest.fixture(scope="session")
 def client():
-    return TestClient(app)
+    # Keep one event loop alive for the whole session so pooled async
+    # connections aren't shared across loops.
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture(autouse=True)
+def reset_auth_limiter():
+    # Every test logs in from the same TestClient address
+    from app.rate_limit import auth_limiter
+
+    auth_limiter.clear()
 
 
 @pytest.fixture
@@ -23,6 +36,29 @@ def db_session():
         db.close()
 
 
+@pytest.fixture
+def max_queries():
+    """``with max_queries(n): ...`` fails if the block runs more than ``n`` statements."""
+    @contextmanager
+    def check(limit):
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        engines = [async_engine.sync_engine, engine]
+        for target in engines:
+            event.listen(target, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            for target in engines:
+                event.remove(target, "before_cursor_execute", record)
+        assert len(statements) <= limit, f"{len(statements)} queries (max {limit}):\n" + "\n".join(statements)
+
+    return check
+
+
 def generate_unique_user(role="user"):
     unique_id = str(uuid.uuid4())[:8]
     return {
@@ -61,3 +61,157 @@ def test_login_nonexistent_user(client):
     )
     assert response.status_code == 401
     assert response.json()["detail"] == "Invalid credentials"
+
+def test_current_user_cache_hit(client, normal_user):
+    from app.security import user_cache
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    assert client.get("/api/sweets/", headers=headers).status_code == 200
+    hits = user_cache.hits
+    assert client.get("/api/sweets/", headers=headers).status_code == 200
+    assert user_cache.hits == hits + 1
+
+def test_role_change_invalidates_cached_user(client, normal_user, db_session):
+    from app.models import User
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    sweet = {"name": f"RoleCache_{uuid.uuid4().hex[:8]}", "category": "Test", "price": 1.0, "quantity": 1}
+    assert client.post("/api/sweets/", headers=headers, json=sweet).status_code == 403
+
+    user = db_session.query(User).filter(User.email == normal_user["email"]).first()
+    user.role = "admin"
+    db_session.commit()
+
+    assert client.post("/api/sweets/", headers=headers, json=sweet).status_code == 201
+
+def test_deleted_user_token_rejected(client, normal_user, db_session):
+    from app.models import User
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    assert client.get("/api/sweets/", headers=headers).status_code == 200
+
+    user = db_session.query(User).filter(User.email == normal_user["email"]).first()
+    db_session.delete(user)
+    db_session.commit()
+
+    assert client.get("/api/sweets/", headers=headers).status_code == 401
+
+def test_out_of_process_role_change_seen_after_cache_ttl(client, normal_user, monkeypatch):
+    import time
+
+    from sqlalchemy import create_engine, text
+
+    from app import security
+    from app.db import engine
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    assert client.get("/api/sweets/", headers=headers).status_code == 200
+    expires_at = security.user_cache._data[normal_user["token"]][0]
+    assert expires_at <= time.time() + security.AUTH_CACHE_TTL
+
+    # Promote through another engine, as psql or another worker would: no ORM events fire here
+    other = create_engine(engine.url)
+    with other.begin() as conn:
+        conn.execute(text("UPDATE users SET role = 'admin' WHERE username = :u"), {"u": normal_user["username"]})
+    other.dispose()
+
+    sweet = {"name": f"RoleTTL_{uuid.uuid4().hex[:8]}", "category": "Test", "price": 1.0, "quantity": 1}
+    assert client.post("/api/sweets/", headers=headers, json=sweet).status_code == 403
+    monkeypatch.setattr(security.time, "time", lambda: expires_at + 1)
+    assert client.post("/api/sweets/", headers=headers, json=sweet).status_code == 201
+
+def test_login_rehashes_outdated_cost(client, normal_user, db_session, monkeypatch):
+    from passlib.context import CryptContext
+
+    from app import utils
+    from app.models import User
+
+    monkeypatch.setattr(utils, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+    response = client.post(
+        "/api/auth/login",
+        data={"username": normal_user["username"], "password": normal_user["password"]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == 200
+
+    user = db_session.query(User).filter(User.email == normal_user["email"]).first()
+    assert user.hashed_password.startswith("$2b$05$")
+
+def test_login_rejected_when_hash_pool_full(client, normal_user, monkeypatch):
+    import threading
+
+    from app import utils
+
+    full = threading.BoundedSemaphore(1)
+    full.acquire()
+    monkeypatch.setattr(utils, "_hash_slots", full)
+    response = client.post(
+        "/api/auth/login",
+        data={"username": normal_user["username"], "password": normal_user["password"]},
+        headers={"Content-Type": "application/x-www-form-urlencoded"}
+    )
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_login_throttled_per_username_before_hashing(client, normal_user, monkeypatch):
+    from app import rate_limit, utils
+
+    calls = []
+
+    async def fake_hasher(*args):
+        calls.append(args)
+        return False, None
+
+    monkeypatch.setattr(utils, "_run_hasher", fake_hasher)
+    attempt = {"username": normal_user["username"], "password": "WrongPassword!"}
+    for _ in range(rate_limit.AUTH_USER_BURST):
+        client.post("/api/auth/login", data=attempt)
+    hashed = len(calls)
+
+    response = client.post("/api/auth/login", data=attempt)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    assert len(calls) == hashed
+
+    # Another account from the same client is still let through
+    response = client.post("/api/auth/login", data={"username": "someone_else", "password": "x"})
+    assert response.status_code == 401
+
+def test_login_throttled_per_client_ip(client, monkeypatch):
+    from app import rate_limit
+
+    monkeypatch.setattr(rate_limit, "AUTH_IP_BURST", 3)
+    statuses = [
+        client.post("/api/auth/login", data={"username": f"spray_{i}", "password": "x"}).status_code
+        for i in range(4)
+    ]
+    assert statuses == [401, 401, 401, 429]
+
+def test_register_throttled(client, normal_user, monkeypatch):
+    from app import rate_limit
+
+    monkeypatch.setattr(rate_limit, "AUTH_IP_BURST", 1)
+    # Rejected as a duplicate the first time, the second attempt never gets that far
+    assert client.post("/api/auth/register", json=normal_user).status_code == 400
+    response = client.post("/api/auth/register", json=normal_user)
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+def test_token_bucket_refills_and_stays_bounded(monkeypatch):
+    from app import rate_limit
+
+    now = [1000.0]
+    monkeypatch.setattr(rate_limit.time, "time", lambda: now[0])
+    limiter = rate_limit.TokenBucketLimiter(maxsize=100)
+    limit = [("user:a", 2, 60)]  # one token a second
+    assert limiter.acquire(limit) == 0
+    assert limiter.acquire(limit) == 0
+    assert limiter.acquire(limit) == pytest.approx(1.0)
+    now[0] += 0.5
+    assert limiter.acquire(limit) == pytest.approx(0.5)
+    now[0] += 0.5
+    assert limiter.acquire(limit) == 0
+
+    for i in range(1000):
+        limiter.acquire([(f"ip:{i}", 5, 60)])
+    assert limiter.buckets.stats()["size"] == 100
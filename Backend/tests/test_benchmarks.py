@@ -0,0 +1,22 @@
+from benchmarks.load import compare, parse_scale, summarize
+
+
+def test_parse_scale():
+    assert parse_scale("1k") == 1_000
+    assert parse_scale("1M") == 1_000_000
+    assert parse_scale("2500") == 2_500
+
+
+def test_summarize_percentiles():
+    summary = summarize([i / 1000 for i in range(1, 101)], errors=2, seconds=2.0)
+    assert summary["requests"] == 100 and summary["errors"] == 2
+    assert summary["rps"] == 50.0
+    assert summary["p50_ms"] == 51.0 and summary["p95_ms"] == 96.0 and summary["p99_ms"] == 100.0
+
+
+def test_compare_flags_regressions():
+    baseline = {"results": {"list": {"rps": 100.0, "p95_ms": 10.0}, "login": {"rps": 20.0, "p95_ms": 50.0}}}
+    current = {"results": {"list": {"rps": 80.0, "p95_ms": 10.5}, "login": {"rps": 19.0, "p95_ms": 70.0}}}
+    regressions = compare(current, baseline, threshold=0.15)
+    assert regressions == ["list: 80.0 req/s vs baseline 100.0", "login: p95 70.0ms vs baseline 50.0ms"]
+    assert compare(baseline, baseline, threshold=0.15) == []
@@ -0,0 +1,102 @@
+import uuid
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from app import db, models
+
+
+def test_reads_go_to_replica_until_client_writes(client: TestClient, normal_user, db_session, tmp_path, monkeypatch):
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    # Resolve the user once so the replica (which has no users) isn't asked
+    assert client.get("/api/sweets/", headers=headers).status_code == 200
+
+    tag = uuid.uuid4().hex[:8]
+    replica_url = f"sqlite:///{tmp_path}/replica.db"
+    replica = create_engine(replica_url)
+    models.Base.metadata.create_all(bind=replica)
+    with Session(replica) as replica_db:
+        replica_db.add(models.Sweet(name=f"replica_{tag}", category="Replica", price=1.0, quantity=1))
+        replica_db.commit()
+
+    primary_sweet = models.Sweet(name=f"primary_{tag}", category="Primary", price=1.0, quantity=5)
+    db_session.add(primary_sweet)
+    db_session.commit()
+
+    replica_async = create_async_engine(db.to_async_url(replica_url))
+    monkeypatch.setattr(db, "replica_sessions", [async_sessionmaker(replica_async, expire_on_commit=False)])
+
+    def names(limit):
+        # a distinct limit per call keeps the page cache out of the way
+        response = client.get(f"/api/sweets/?limit={limit}", headers=headers)
+        assert response.status_code == 200
+        return {s["name"] for s in response.json()}
+
+    assert f"replica_{tag}" in names(1001)
+    assert f"primary_{tag}" not in names(1002)
+
+    assert client.post(f"/api/sweets/{primary_sweet.id}/purchase", headers=headers).status_code == 200
+    assert f"primary_{tag}" in names(1003)
+
+    client.portal.call(replica_async.dispose)
+
+
+def test_new_user_resolved_from_primary_while_replica_lags(client: TestClient, normal_user, tmp_path, monkeypatch):
+    from app.security import user_cache
+
+    # The replica has the schema but not the user who just signed up
+    replica_url = f"sqlite:///{tmp_path}/lagging.db"
+    models.Base.metadata.create_all(bind=create_engine(replica_url))
+    replica_async = create_async_engine(db.to_async_url(replica_url))
+    monkeypatch.setattr(db, "replica_sessions", [async_sessionmaker(replica_async, expire_on_commit=False)])
+    user_cache.clear()
+
+    response = client.get("/api/sweets/?limit=1004", headers={"Authorization": f"Bearer {normal_user['token']}"})
+    assert response.status_code == 200
+
+    client.portal.call(replica_async.dispose)
+
+
+def test_writer_not_served_a_page_cached_from_a_lagging_replica(
+    client: TestClient, normal_user, admin_user, db_session, tmp_path, monkeypatch
+):
+    buyer = {"Authorization": f"Bearer {normal_user['token']}"}
+    other = {"Authorization": f"Bearer {admin_user['token']}"}
+
+    tag = uuid.uuid4().hex[:8]
+    sweet = models.Sweet(name=f"lagging_{tag}", category="Replica", price=1.0, quantity=5)
+    db_session.add(sweet)
+    db_session.commit()
+
+    # The replica holds the same sweet but never sees the purchase below
+    replica_url = f"sqlite:///{tmp_path}/stale.db"
+    replica = create_engine(replica_url)
+    models.Base.metadata.create_all(bind=replica)
+    with Session(replica) as replica_db:
+        replica_db.add(models.Sweet(id=sweet.id, name=sweet.name, category="Replica", price=1.0, quantity=5))
+        replica_db.commit()
+    replica_async = create_async_engine(db.to_async_url(replica_url))
+    monkeypatch.setattr(db, "replica_sessions", [async_sessionmaker(replica_async, expire_on_commit=False)])
+
+    def quantity(headers):
+        response = client.get("/api/sweets/?limit=1005", headers=headers)
+        assert response.status_code == 200
+        return {s["name"]: s["quantity"] for s in response.json()}[sweet.name]
+
+    def single(headers):
+        response = client.get(f"/api/sweets/{sweet.id}", headers=headers)
+        assert response.status_code == 200
+        return response.json()["quantity"]
+
+    assert client.post(f"/api/sweets/{sweet.id}/purchase", headers=buyer).status_code == 200
+
+    # Another client reads the replica and caches the stale page under the new version
+    assert quantity(other) == 5
+    assert single(other) == 5
+    # The buyer still reads their own purchase
+    assert quantity(buyer) == 4
+    assert single(buyer) == 4
+
+    client.portal.call(replica_async.dispose)
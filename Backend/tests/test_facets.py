@@ -0,0 +1,136 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import models
+
+
+def facet(client, headers, category):
+    response = client.get("/api/sweets/facets", headers=headers)
+    assert response.status_code == 200
+    return next((c for c in response.json()["categories"] if c["category"] == category), None)
+
+
+@pytest.fixture
+def admin_headers(client, admin_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    # Other tests insert sweets straight into the table, start from a clean slate
+    assert client.post("/api/ops/facets/rebuild", headers=headers).json() == {"consistent": True}
+    return headers
+
+
+def test_facets_follow_every_write(client: TestClient, admin_headers):
+    headers, tag = admin_headers, uuid.uuid4().hex[:6]
+    category, other = f"Facet {tag}", f"Other {tag}"
+
+    def create(name, price, quantity):
+        return client.post(
+            "/api/sweets/", headers=headers,
+            json={"name": f"{name} {tag}", "category": category, "price": price, "quantity": quantity},
+        ).json()["id"]
+
+    cheap, mid, dear = create("Cheap", 1.0, 10), create("Mid", 2.0, 5), create("Dear", 4.0, 2)
+    assert facet(client, headers, category) == {
+        "category": category, "sweet_count": 3, "total_quantity": 17, "stock_value": 28.0,
+        "min_price": 1.0, "max_price": 4.0,
+    }
+
+    client.post(f"/api/sweets/{cheap}/purchase", headers=headers)
+    client.post(f"/api/sweets/{dear}/restock?amount=3", headers=headers)
+    client.post("/api/sweets/checkout", headers=headers, json={"items": [{"sweet_id": mid, "quantity": 2}]})
+    summary = facet(client, headers, category)
+    assert (summary["total_quantity"], summary["stock_value"]) == (17, 35.0)
+
+    client.patch(f"/api/sweets/{cheap}", headers=headers, json={"price": 3.0, "quantity": 4})
+    client.delete(f"/api/sweets/{dear}", headers=headers)
+    summary = facet(client, headers, category)
+    assert (summary["sweet_count"], summary["min_price"], summary["max_price"]) == (2, 2.0, 3.0)
+    assert (summary["total_quantity"], summary["stock_value"]) == (7, 18.0)
+
+    client.patch(f"/api/sweets/{mid}", headers=headers, json={"category": other})
+    assert facet(client, headers, other)["sweet_count"] == 1
+    client.delete(f"/api/sweets/{cheap}", headers=headers)
+    assert facet(client, headers, category) is None
+
+    assert client.get("/api/ops/facets/verify", headers=headers).json() == {"consistent": True, "mismatches": []}
+
+
+def test_facets_after_import(client: TestClient, admin_headers):
+    tag = uuid.uuid4().hex[:6]
+    body = f"name,category,price,quantity\nImported A {tag},Import {tag},2.5,4\nImported B {tag},Import {tag},1.5,2\n"
+    client.post("/api/sweets/import?format=csv", headers=admin_headers, content=body)
+    assert facet(client, admin_headers, f"Import {tag}")["stock_value"] == 13.0
+    assert client.get("/api/ops/facets/verify", headers=admin_headers).json()["consistent"] is True
+
+
+def test_facets_verify_and_rebuild(client: TestClient, admin_headers, db_session):
+    category = f"Drift {uuid.uuid4().hex[:6]}"
+    db_session.add(models.Sweet(name=category, category=category, price=9.0, quantity=1))
+    db_session.commit()
+
+    report = client.get("/api/ops/facets/verify", headers=admin_headers).json()
+    assert report["consistent"] is False
+    assert report["mismatches"][0]["category"] == category
+    assert report["mismatches"][0]["sweet_count"] == {"expected": 1, "actual": None}
+
+    assert client.post("/api/ops/facets/rebuild", headers=admin_headers).json() == {"consistent": True}
+    assert facet(client, admin_headers, category)["stock_value"] == 9.0
+
+
+def test_stock_changes_append_deltas_and_fold(client: TestClient, admin_headers, db_session, max_queries):
+    from app import facets
+    from app.db import AsyncSessionLocal
+
+    tag = uuid.uuid4().hex[:6]
+    category = f"Fold {tag}"
+    sweet = client.post(
+        "/api/sweets/", headers=admin_headers,
+        json={"name": f"Fold {tag}", "category": category, "price": 2.0, "quantity": 10},
+    ).json()
+
+    # Buyers only insert, they never wait on the category's summary row
+    with max_queries(10) as statements:
+        assert client.post(f"/api/sweets/{sweet['id']}/purchase", headers=admin_headers).status_code == 200
+    assert not any("category_summaries" in statement for statement in statements)
+    assert any(statement.startswith("INSERT INTO category_stock_deltas") for statement in statements)
+    client.post(f"/api/sweets/{sweet['id']}/restock?amount=3", headers=admin_headers)
+
+    # Pending deltas are already part of what readers see
+    assert facet(client, admin_headers, category)["total_quantity"] == 12
+
+    async def fold():
+        async with AsyncSessionLocal() as db:
+            await facets.fold(db)
+            await db.commit()
+
+    client.portal.call(fold)
+    assert db_session.query(models.CategoryStockDelta).filter_by(category=category).count() == 0
+    summary = db_session.get(models.CategorySummary, category)
+    db_session.refresh(summary)
+    assert (summary.total_quantity, summary.stock_value) == (12, 24.0)
+    assert facet(client, admin_headers, category)["total_quantity"] == 12
+    assert client.get("/api/ops/facets/verify", headers=admin_headers).json()["consistent"] is True
+
+
+def test_refresh_and_rebuild_hold_writers_off_before_deleting_deltas(client: TestClient, admin_headers, max_queries):
+    from app import facets
+    from app.db import AsyncSessionLocal
+
+    category = f"Refresh {uuid.uuid4().hex[:6]}"
+
+    async def refresh():
+        async with AsyncSessionLocal() as db:
+            await facets.refresh_categories(db, [category])
+            await db.commit()
+
+    # A purchase commits its delta while holding the sweet row, so the category's
+    # rows are locked before deltas are dropped and the aggregate is taken
+    with max_queries(10) as statements:
+        client.portal.call(refresh)
+    statements = [" ".join(statement.split()) for statement in statements]
+    first_lock = next(i for i, s in enumerate(statements) if s.startswith("SELECT sweets.id FROM sweets"))
+    assert first_lock < next(i for i, s in enumerate(statements) if s.startswith("DELETE FROM category_stock_deltas"))
+
+    assert str(facets.rebuild_statements("postgresql")[0]) == "LOCK TABLE sweets IN SHARE ROW EXCLUSIVE MODE"
+    assert not any("LOCK" in str(stmt) for stmt in facets.rebuild_statements("sqlite"))
@@ -0,0 +1,47 @@
+import asyncio
+import time
+
+from fastapi.testclient import TestClient
+
+from app.metrics import MetricsMiddleware, Registry
+
+
+def test_metrics_use_route_templates(client: TestClient, normal_user):
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    client.get("/api/sweets/", headers=headers)
+    client.post("/api/sweets/999999/purchase", headers=headers)
+    client.get("/no/such/path")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/sweets/",status="200"}' in body
+    assert 'method="POST",route="/api/sweets/{sweet_id}/purchase"' in body
+    assert 'route="unmatched",status="404"' in body
+    assert "/api/sweets/999999" not in body
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/api/sweets/",le="+Inf"}' in body
+    assert "http_response_size_bytes_count" in body
+    assert "http_requests_in_flight 1" in body  # the scrape itself
+
+
+def test_middleware_overhead():
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"ok"})
+
+    async def send(message):
+        pass
+
+    async def run(asgi, n):
+        scope = {"type": "http", "method": "GET", "path": "/"}
+        start = time.perf_counter()
+        for _ in range(n):
+            await asgi(scope, None, send)
+        return time.perf_counter() - start
+
+    n = 20_000
+    bare = asyncio.run(run(app, n))
+    wrapped = asyncio.run(run(MetricsMiddleware(app, Registry()), n))
+    overhead_us = (wrapped - bare) / n * 1e6
+    assert overhead_us < 50, f"{overhead_us:.1f}µs per request"
@@ -0,0 +1,25 @@
+from fastapi.testclient import TestClient
+
+
+def test_pool_stats(client: TestClient, admin_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    client.get("/api/sweets/", headers=headers)
+
+    response = client.get("/api/ops/pool", headers=headers)
+    assert response.status_code == 200
+    primary = response.json()["primary"]
+    assert primary["checkouts"] > 0
+    assert primary["checkouts"] - primary["checkins"] == primary["checked_out"]
+    assert primary["timeouts"] == 0
+    assert {"pool_size", "idle", "overflow", "wait_avg_ms", "wait_max_ms"} <= primary.keys()
+
+
+def test_cache_stats(client: TestClient, admin_user):
+    response = client.get("/api/ops/caches", headers={"Authorization": f"Bearer {admin_user['token']}"})
+    assert response.status_code == 200
+    assert {"users", "catalog_pages", "flash_sale"} <= response.json().keys()
+
+
+def test_ops_admin_only(client: TestClient, normal_user):
+    response = client.get("/api/ops/pool", headers={"Authorization": f"Bearer {normal_user['token']}"})
+    assert response.status_code == 403
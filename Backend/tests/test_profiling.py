@@ -0,0 +1,41 @@
+import pstats
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.main import app as main_app
+from app.profiling import ProfilerMiddleware
+
+
+def make_client(tmp_path, **options):
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    app.add_middleware(ProfilerMiddleware, directory=str(tmp_path), **options)
+    return TestClient(app)
+
+
+def test_profile_on_header(tmp_path):
+    client = make_client(tmp_path, token="secret")
+    client.get("/items/1")
+    client.get("/items/1", headers={"X-Profile": "wrong"})
+    assert list(tmp_path.iterdir()) == []
+
+    client.get("/items/1", headers={"X-Profile": "secret"})
+    [dump] = tmp_path.iterdir()
+    assert "_GET_items_item_id_" in dump.name and dump.suffix == ".pstats"
+    assert pstats.Stats(str(dump)).total_calls > 0
+
+
+def test_profile_sampling(tmp_path):
+    client = make_client(tmp_path, token=None, sample_rate=1.0)
+    client.get("/items/1")
+    client.get("/items/2")
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_profiler_not_installed_by_default():
+    assert not any(m.cls is ProfilerMiddleware for m in main_app.user_middleware)
@@ -0,0 +1,39 @@
+import logging
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app import query_stats
+
+
+def test_server_timing_header(client: TestClient, normal_user):
+    response = client.get("/api/sweets/search?name=zzz", headers={"Authorization": f"Bearer {normal_user['token']}"})
+    assert response.status_code == 200
+    timing = response.headers["server-timing"]
+    assert timing.startswith("db;dur=")
+    assert "queries" in timing and "db-slowest;dur=" in timing
+
+
+def test_query_budgets(client: TestClient, admin_user, max_queries):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    client.get("/api/sweets/", headers=headers)  # warm the user cache
+
+    with max_queries(1):
+        client.get(f"/api/sweets/?limit=7&skip={uuid.uuid4().int % 1000}", headers=headers)
+    with max_queries(5):
+        sweet = client.post(
+            "/api/sweets/",
+            headers=headers,
+            json={"name": f"Budget {uuid.uuid4().hex[:6]}", "category": "Test", "price": 1.0, "quantity": 5},
+        ).json()
+    with max_queries(3):
+        assert client.post(f"/api/sweets/{sweet['id']}/purchase", headers=headers).status_code == 200
+
+
+def test_slow_query_logged_redacted(client: TestClient, normal_user, monkeypatch, caplog):
+    monkeypatch.setattr(query_stats, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.query_stats"):
+        client.get("/api/sweets/search?name=SecretName", headers={"Authorization": f"Bearer {normal_user['token']}"})
+    messages = [record.getMessage() for record in caplog.records if record.name == "app.query_stats"]
+    assert messages and all(message.startswith("Slow query") for message in messages)
+    assert not any("SecretName" in message for message in messages)
@@ -0,0 +1,60 @@
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from app import models, search
+from app.db import engine
+from app.pagination import keyset
+
+
+@pytest.mark.skipif(engine.dialect.name != "sqlite", reason="SQLite query plan")
+def test_search_uses_fts_index(client: TestClient):
+    assert search.backend == "fts5"
+    query, _ = search.text_search(select(models.Sweet), "ladoo", "indian")
+    sql = keyset(query, "id", None).limit(50).compile(engine, compile_kwargs={"literal_binds": True})
+
+    with engine.connect() as conn:
+        plan = [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+    assert any("sweets_fts VIRTUAL TABLE INDEX" in step for step in plan)
+    assert not any(step.startswith("SCAN sweets ") or step == "SCAN sweets" for step in plan)
+
+
+@pytest.mark.skipif(engine.dialect.name != "postgresql", reason="Postgres query plan")
+def test_search_uses_trigram_index(client: TestClient):
+    assert search.backend == "trgm"
+    query, _ = search.text_search(select(models.Sweet), "ladoo", None)
+    sql = query.compile(engine, compile_kwargs={"literal_binds": True})
+
+    with engine.connect() as conn:
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        plan = "\n".join(row[0] for row in conn.exec_driver_sql(f"EXPLAIN {sql}"))
+
+    assert "ix_sweets_name_trgm" in plan
+
+
+def test_search_index_follows_writes(client: TestClient, admin_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    tag = uuid.uuid4().hex[:8]
+    created = client.post(
+        "/api/sweets/",
+        headers=headers,
+        json={"name": f"Kaju Katli {tag}", "category": f"Barfi{tag}", "price": 12.0, "quantity": 4},
+    ).json()
+
+    def names(params):
+        response = client.get("/api/sweets/search", headers=headers, params=params)
+        assert response.status_code == 200
+        return [s["name"] for s in response.json()]
+
+    assert names({"name": f"KATLI {tag.upper()}"}) == [created["name"]]
+    assert names({"category": f"barfi{tag}", "sort": "relevance"}) == [created["name"]]
+
+    client.patch(f"/api/sweets/{created['id']}", headers=headers, json={"category": f"Mithai{tag}"})
+    assert names({"category": f"barfi{tag}"}) == []
+    assert names({"category": f"mithai{tag}"}) == [created["name"]]
+
+    client.delete(f"/api/sweets/{created['id']}", headers=headers)
+    assert names({"name": f"katli {tag}"}) == []
@@ -0,0 +1,140 @@
+import asyncio
+import gc
+import json
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+from app import stock_feed as feed_module
+from app.main import app
+from app.stock_feed import RESET, StockFeed, stock_feed
+
+IDLE_SUBSCRIBERS = 2000
+
+
+def test_slow_consumer_coalesces_and_resumes(monkeypatch):
+    feed = StockFeed(history=10)
+
+    async def scenario():
+        slow = feed.subscribe()
+        for quantity in (5, 4, 3):
+            feed.publish(1, quantity, 2.5)
+        feed.publish(2, 9, 1.0)
+        batch = await feed.next_batch(slow, timeout=0)
+        # Only the newest state of sweet 1 is left, still in sequence order
+        assert [json.loads(payload)["quantity"] for _, payload in batch] == [3, 9]
+        last_id = batch[-1][0]
+
+        feed.publish(1, 2, 2.5)
+        resumed = feed.subscribe(last_id)
+        assert [json.loads(p) for _, p in await feed.next_batch(resumed, timeout=0)] == [
+            {"id": 1, "quantity": 2, "price": 2.5, "deleted": False}
+        ]
+
+        # Ids from before a restart, or older than the history, mean a resync
+        assert (await feed.next_batch(feed.subscribe("deadbeef-1"), timeout=0))[0][1] is RESET
+        for quantity in range(20):
+            feed.publish(3, quantity, 1.0)
+        assert (await feed.next_batch(feed.subscribe(last_id), timeout=0))[0][1] is RESET
+
+        monkeypatch.setattr(feed_module, "FEED_QUEUE_SIZE", 2)
+        flooded = feed.subscribe()
+        for sweet_id in range(5):
+            feed.publish(sweet_id, 1, 1.0)
+        assert [p for _, p in await feed.next_batch(flooded, timeout=0)] == [RESET]
+        assert await feed.next_batch(flooded, timeout=0) == []
+
+    asyncio.run(scenario())
+
+
+def test_mutations_publish_events(client: TestClient, admin_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    subscription = stock_feed.subscribe()
+    try:
+        sweet = client.post(
+            "/api/sweets/", headers=headers, json={"name": "Feed Barfi", "category": "Indian", "price": 3.0, "quantity": 4}
+        ).json()
+        client.post(f"/api/sweets/{sweet['id']}/purchase", headers=headers)
+        client.post(f"/api/sweets/{sweet['id']}/restock?amount=6", headers=headers)
+        assert json.loads(subscription.pending[sweet["id"]][1]) == {
+            "id": sweet["id"], "quantity": 9, "price": 3.0, "deleted": False
+        }
+
+        client.delete(f"/api/sweets/{sweet['id']}", headers=headers)
+        assert json.loads(subscription.pending[sweet["id"]][1])["deleted"] is True
+    finally:
+        stock_feed.unsubscribe(subscription)
+
+
+def test_stream_token_for_eventsource(client: TestClient, normal_user):
+    from app.db import AsyncSessionLocal
+    from app.security import get_stream_user
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    response = client.post("/api/sweets/stream/token", headers=headers)
+    assert response.status_code == 200
+    token = response.json()["token"]
+
+    async def resolve(query_token):
+        async with AsyncSessionLocal() as db:
+            return await get_stream_user(token=query_token, bearer=None, db=db)
+
+    assert client.portal.call(resolve, token).username == normal_user["username"]
+    assert client.get("/api/sweets/stream").status_code == 401
+    assert client.get("/api/sweets/stream?token=garbage").status_code == 401
+    # Only good for the stream: not accepted as an access token, nor an access token as one
+    assert client.get("/api/sweets/?limit=1", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    assert client.get(f"/api/sweets/stream?token={normal_user['token']}").status_code == 401
+
+
+def test_idle_sse_subscribers_memory(client: TestClient, normal_user):
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    client.get("/api/sweets/?limit=1", headers=headers)  # warm the user cache, so streams need no DB
+    raw_headers = [(b"host", b"test"), (b"authorization", headers["Authorization"].encode())]
+
+    async def open_stream(disconnect: asyncio.Event, received: list):
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                assert message["status"] == 200
+            elif message.get("body"):
+                received.append(message["body"])
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+            "scheme": "http", "path": "/api/sweets/stream", "raw_path": b"/api/sweets/stream",
+            "query_string": b"", "root_path": "", "headers": raw_headers,
+            "client": ("127.0.0.1", 1), "server": ("test", 80),
+        }
+        await app(scope, receive, send)
+
+    async def scenario():
+        disconnect = asyncio.Event()
+        received = [[] for _ in range(IDLE_SUBSCRIBERS)]
+        before_subscribers = len(stock_feed.subscribers)
+
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        tasks = [asyncio.create_task(open_stream(disconnect, inbox)) for inbox in received]
+        while len(stock_feed.subscribers) < before_subscribers + IDLE_SUBSCRIBERS:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        gc.collect()
+        per_connection = (tracemalloc.get_traced_memory()[0] - baseline) / IDLE_SUBSCRIBERS
+        tracemalloc.stop()
+
+        stock_feed.publish(424242, 7, 1.5)
+        while not all(received):
+            await asyncio.sleep(0.01)
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        return per_connection, received, len(stock_feed.subscribers) - before_subscribers
+
+    per_connection, received, left = asyncio.run(scenario())
+    assert per_connection < 40 * 1024
+    assert all(b'"id":424242,"quantity":7' in b"".join(inbox) for inbox in received)
+    assert left == 0
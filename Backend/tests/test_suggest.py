@@ -0,0 +1,65 @@
+import uuid
+
+from fastapi.testclient import TestClient
+
+from app import suggest
+from app.suggest import SuggestIndex
+
+
+def make_index(rows):
+    index = SuggestIndex()
+    index.load(rows)
+    index.ready = True
+    return index
+
+
+def test_suggest_index_ranks_and_updates(monkeypatch):
+    index = make_index([(1, "Kaju Katli", "Indian", 5), (2, "Kalakand", "Indian", 9), (3, "Fudge", "Western", 1)])
+    assert [s["id"] for s in index.suggest("ka")] == [2, 1]
+    assert [s["id"] for s in index.suggest("IND")] == [2, 1]
+    assert index.suggest("kaju")[0] == {"id": 1, "name": "Kaju Katli", "category": "Indian", "quantity": 5}
+
+    index.on_stock_change(1, 20, False)
+    assert [s["id"] for s in index.suggest("ka")] == [1, 2]
+
+    index.upsert(3, "Kaju Fudge", "Fusion", 2)
+    assert [s["id"] for s in index.suggest("kaju")] == [1, 3]
+    assert index.suggest("western") == []
+
+    index.on_stock_change(1, None, True)
+    assert [s["id"] for s in index.suggest("ka")] == [2, 3]
+    assert list(index.keys) == sorted(index.keys) and len(index.keys) == len(index.ids) == 4
+
+    monkeypatch.setattr(suggest, "SUGGEST_SCAN_LIMIT", 1)
+    assert len(index.suggest("ka")) == 1
+
+
+def test_unbuilt_index_ignores_changes():
+    index = SuggestIndex()
+    index.on_stock_change(1, 5, False)
+    index.upsert(1, "Ladoo", "Indian", 5)
+    assert index._queued == [] and index.sweets == {}
+
+
+def test_suggest_endpoint(client: TestClient, admin_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    tag = uuid.uuid4().hex[:6]
+    ids = [
+        client.post(
+            "/api/sweets/", headers=headers,
+            json={"name": f"Zq{tag} {i}", "category": "Typeahead", "price": 1.0, "quantity": quantity},
+        ).json()["id"]
+        for i, quantity in enumerate((3, 7, 5))
+    ]
+
+    response = client.get(f"/api/sweets/suggest?prefix=zQ{tag}", headers=headers)
+    assert response.status_code == 200
+    assert [s["id"] for s in response.json()] == [ids[1], ids[2], ids[0]]
+
+    client.post(f"/api/sweets/{ids[0]}/restock?amount=10", headers=headers)
+    client.delete(f"/api/sweets/{ids[1]}", headers=headers)
+    client.post("/api/sweets/", headers=headers, json={"name": f"Zq{tag} new", "category": "X", "price": 1.0, "quantity": 1})
+    response = client.get(f"/api/sweets/suggest?prefix=zq{tag}&limit=2", headers=headers)
+    assert [(s["id"], s["quantity"]) for s in response.json()] == [(ids[0], 13), (ids[2], 5)]
+
+    assert client.get("/api/sweets/suggest?prefix=", headers=headers).status_code == 422
@@ -1,7 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import json
+import uuid
+
 import pytest
 from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
 
-from app import models
+from app import models, schemas
 from app.db import SessionLocal
 
 
@@ -42,6 +48,61 @@ def test_list_sweets(client: TestClient, normal_user):
     assert isinstance(response.json(), list)
 
 
+def test_list_sweets_matches_response_model_bytes(client: TestClient, admin_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    for price in (0.1, 12.5, 1e16):
+        client.post(
+            "/api/sweets/",
+            headers=headers,
+            json={"name": f"Crème \"brûlée\" 🍮 {uuid.uuid4().hex[:6]}", "category": "Dessert", "price": price, "quantity": 3},
+        )
+    response = client.get("/api/sweets/search?category=dessert&limit=500", headers=headers)
+    sweets = TypeAdapter(list[schemas.SweetResponse])
+    assert len(response.json()) >= 3
+    assert response.content == sweets.dump_json(sweets.validate_json(response.content))
+
+
+def test_list_sweets_conditional_get(client: TestClient, normal_user, max_queries):
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    first = client.get("/api/sweets/?limit=5", headers=headers)
+    etag = first.headers["etag"]
+    assert etag.startswith('"') and first.headers["cache-control"] == "private, no-cache"
+
+    with max_queries(0):
+        cached = client.get("/api/sweets/?limit=5", headers={**headers, "If-None-Match": f'W/"nope", W/{etag}'})
+    assert cached.status_code == 304
+    assert cached.content == b"" and cached.headers["etag"] == etag
+
+    assert client.get("/api/sweets/?limit=5", headers={**headers, "If-None-Match": '"nope"'}).status_code == 200
+
+
+# ------------------ GET SWEET ------------------
+def test_get_sweet_etag_follows_row_version(client: TestClient, admin_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    sweet = client.post(
+        "/api/sweets/", headers=headers, json={"name": f"Peda {uuid.uuid4().hex[:6]}", "category": "Indian", "price": 4.0, "quantity": 5}
+    ).json()
+
+    response = client.get(f"/api/sweets/{sweet['id']}", headers=headers)
+    assert response.status_code == 200
+    assert response.json() == sweet
+    assert response.headers["etag"] == f'"sweet-{sweet["id"]}-v1"'
+    etag = response.headers["etag"]
+    assert client.get(f"/api/sweets/{sweet['id']}", headers={**headers, "If-None-Match": etag}).status_code == 304
+
+    client.post(f"/api/sweets/{sweet['id']}/restock?amount=2", headers=headers)
+    client.patch(f"/api/sweets/{sweet['id']}", headers=headers, json={"price": 4.5})
+    response = client.get(f"/api/sweets/{sweet['id']}", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] == f'"sweet-{sweet["id"]}-v3"'
+    assert response.json()["quantity"] == 7 and response.json()["price"] == 4.5
+
+
+def test_get_sweet_not_found(client: TestClient, normal_user):
+    response = client.get("/api/sweets/999999", headers={"Authorization": f"Bearer {normal_user['token']}"})
+    assert response.status_code == 404
+
+
 # ------------------ UPDATE SWEET ------------------
 def test_update_sweet_success(client: TestClient, admin_user, db_session):
     sweet = models.Sweet(name="UpdateMe", category="Test", price=1.0, quantity=1)
@@ -130,6 +191,58 @@ def test_search_sweets_no_results(client: TestClient, normal_user):
     assert response.json() == []
 
 
+def test_search_sweets_cursor_pagination(client: TestClient, normal_user, db_session):
+    category = f"page_{uuid.uuid4().hex[:8]}"
+    prices = [5.0, 1.0, 3.0, 3.0, 2.0]
+    db_session.add_all([
+        models.Sweet(name=f"{category}_{i}", category=category, price=price, quantity=1)
+        for i, price in enumerate(prices)
+    ])
+    db_session.commit()
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    seen, cursor = [], None
+    while True:
+        url = f"/api/sweets/search?category={category}&sort=price&limit=2"
+        if cursor:
+            url += f"&after={cursor}"
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        seen += response.json()
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+
+    assert [s["price"] for s in seen] == sorted(prices)
+    assert len({s["id"] for s in seen}) == len(prices)
+
+
+def test_list_sweets_invalid_cursor(client: TestClient, normal_user):
+    response = client.get("/api/sweets/?after=not-a-cursor", headers={"Authorization": f"Bearer {normal_user['token']}"})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+def test_search_cache_invalidated_by_purchase(client: TestClient, admin_user, normal_user):
+    from app.catalog_cache import page_cache
+
+    name = f"cached_{uuid.uuid4().hex[:8]}"
+    sweet = client.post(
+        "/api/sweets/",
+        headers={"Authorization": f"Bearer {admin_user['token']}"},
+        json={"name": name, "category": "Cache", "price": 3.0, "quantity": 2},
+    ).json()
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    assert client.get(f"/api/sweets/search?name={name}", headers=headers).json()[0]["quantity"] == 2
+    hits = page_cache.hits
+    assert client.get(f"/api/sweets/search?name={name.upper()}", headers=headers).json()[0]["quantity"] == 2
+    assert page_cache.hits == hits + 1
+
+    client.post(f"/api/sweets/{sweet['id']}/purchase", headers=headers)
+    assert client.get(f"/api/sweets/search?name={name}", headers=headers).json()[0]["quantity"] == 1
+
+
 # ------------------ PURCHASE SWEET ------------------
 def test_purchase_sweet_success(client: TestClient, normal_user, db_session):
     sweet = models.Sweet(name="BuyMe", category="Snack", price=5.0, quantity=2)
@@ -164,6 +277,123 @@ def test_purchase_sweet_not_found(client: TestClient, normal_user):
     assert response.json()["detail"] == "Sweet not available"
 
 
+def test_purchase_sweet_concurrent_no_oversell(client: TestClient, normal_user, db_session):
+    sweet = models.Sweet(name="FlashSale", category="Snack", price=5.0, quantity=150)
+    db_session.add(sweet)
+    db_session.commit()
+    db_session.refresh(sweet)
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+
+    def buy(_):
+        return client.post(f"/api/sweets/{sweet.id}/purchase", headers=headers).status_code
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        codes = list(pool.map(buy, range(200)))
+
+    assert codes.count(200) == 150
+    assert codes.count(400) == 50
+
+    db_session.refresh(sweet)
+    assert sweet.quantity == 0
+
+
+def test_purchase_sweet_flash_sale_batches(client: TestClient, normal_user, db_session, monkeypatch):
+    from app import flash_sale
+
+    batcher = flash_sale.PurchaseBatcher(window_ms=20)
+    monkeypatch.setattr(flash_sale, "FLASH_SALE_MODE", True)
+    monkeypatch.setattr(flash_sale, "purchase_batcher", batcher)
+
+    sweet = models.Sweet(name="FlashBatch", category="Snack", price=5.0, quantity=60)
+    db_session.add(sweet)
+    db_session.commit()
+    db_session.refresh(sweet)
+
+    headers = {"Authorization": f"Bearer {normal_user['token']}"}
+
+    def buy(_):
+        return client.post(f"/api/sweets/{sweet.id}/purchase", headers=headers)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        responses = list(pool.map(buy, range(80)))
+
+    ok = [r.json()["quantity"] for r in responses if r.status_code == 200]
+    assert sorted(ok) == list(range(60))
+    assert sum(r.status_code == 400 for r in responses) == 20
+    assert batcher.purchases == 60
+    assert batcher.commits < 80
+
+    db_session.refresh(sweet)
+    assert sweet.quantity == 0
+
+
+
+def test_flash_sale_skips_cancelled_purchases(client: TestClient, normal_user, db_session):
+    import asyncio
+
+    from app import flash_sale
+
+    sweet = models.Sweet(name=f"FlashCancel_{uuid.uuid4().hex[:8]}", category="Snack", price=5.0, quantity=10)
+    db_session.add(sweet)
+    db_session.commit()
+    batcher = flash_sale.PurchaseBatcher(window_ms=50)
+
+    async def scenario():
+        kept = asyncio.ensure_future(batcher.purchase(sweet.id, 1))
+        gone = asyncio.ensure_future(batcher.purchase(sweet.id, 2))
+        await asyncio.sleep(0)
+        gone.cancel()
+        return await kept
+
+    # On the client's event loop, where the app's pooled connections live
+    assert client.portal.call(scenario)["quantity"] == 9
+    db_session.refresh(sweet)
+    assert sweet.quantity == 9
+    assert db_session.query(models.StockMovement).filter_by(sweet_id=sweet.id, reason="purchase").count() == 1
+
+# ------------------ CHECKOUT ------------------
+def test_checkout_success(client: TestClient, normal_user, db_session):
+    a = models.Sweet(name="CartA", category="Snack", price=1.0, quantity=5)
+    b = models.Sweet(name="CartB", category="Snack", price=2.0, quantity=3)
+    db_session.add_all([a, b])
+    db_session.commit()
+
+    response = client.post(
+        "/api/sweets/checkout",
+        headers={"Authorization": f"Bearer {normal_user['token']}"},
+        json={"items": [
+            {"sweet_id": b.id, "quantity": 2},
+            {"sweet_id": a.id, "quantity": 1},
+            {"sweet_id": a.id, "quantity": 2},
+        ]},
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert [s["id"] for s in data] == sorted([a.id, b.id])
+    assert {s["name"]: s["quantity"] for s in data} == {"CartA": 2, "CartB": 1}
+
+
+def test_checkout_all_or_nothing(client: TestClient, normal_user, db_session):
+    a = models.Sweet(name="CartEnough", category="Snack", price=1.0, quantity=5)
+    b = models.Sweet(name="CartShort", category="Snack", price=2.0, quantity=1)
+    db_session.add_all([a, b])
+    db_session.commit()
+
+    response = client.post(
+        "/api/sweets/checkout",
+        headers={"Authorization": f"Bearer {normal_user['token']}"},
+        json={"items": [{"sweet_id": a.id, "quantity": 1}, {"sweet_id": b.id, "quantity": 2}]},
+    )
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Sweet not available"
+
+    db_session.refresh(a)
+    db_session.refresh(b)
+    assert a.quantity == 5
+    assert b.quantity == 1
+
+
 # ------------------ RESTOCK SWEET ------------------
 def test_restock_sweet_success(client: TestClient, admin_user, db_session):
     sweet = models.Sweet(name="RestockMe", category="Snack", price=5.0, quantity=1)
@@ -198,3 +428,227 @@ def test_restock_sweet_not_found(client: TestClient, admin_user):
     )
     assert response.status_code == 404
     assert response.json()["detail"] == "Sweet not found"
+
+
+# ------------------ BATCH OPERATIONS ------------------
+def test_batch_update_restock_delete(client: TestClient, admin_user, max_queries):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    category = f"Batch {uuid.uuid4().hex[:6]}"
+    ids = [
+        client.post(
+            "/api/sweets/", headers=headers,
+            json={"name": f"{category} {i}", "category": category, "price": 1.0 + i, "quantity": i},
+        ).json()["id"]
+        for i in range(5)
+    ]
+
+    response = client.post("/api/sweets/batch/update", headers=headers, json={"category": category, "changes": {"price": 9.5}})
+    assert response.status_code == 200
+    assert [(s["id"], s["price"]) for s in response.json()] == [(i, 9.5) for i in ids]
+
+    with max_queries(7) as statements:
+        response = client.post("/api/sweets/batch/restock", headers=headers, json={"ids": ids[:3], "amount": 10})
+    assert [s["quantity"] for s in response.json()] == [10, 11, 12]
+    # Rows are locked in id order (as checkout does) before the UPDATE touches them
+    on_sweets = [st for st in statements if st.startswith(("SELECT sweets.", "UPDATE sweets"))]
+    assert on_sweets[0].startswith("SELECT") and "ORDER BY sweets.id" in on_sweets[0]
+    assert on_sweets[1].startswith("UPDATE sweets")
+    movements = client.get(f"/api/sweets/{ids[0]}/movements", headers=headers).json()
+    assert (movements[0]["reason"], movements[0]["delta"]) == ("restock", 10)
+
+    # ids and category combine: only listed sweets still in the category
+    response = client.post("/api/sweets/batch/delete", headers=headers, json={"ids": ids[3:] + [999999], "category": category})
+    assert [s["id"] for s in response.json()] == ids[3:]
+    listed = client.get(f"/api/sweets/search?category={category}", headers=headers).json()
+    assert sorted(s["id"] for s in listed) == ids[:3]
+
+
+def test_batch_requires_filter_and_changes(client: TestClient, admin_user, normal_user):
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    assert client.post("/api/sweets/batch/delete", headers=headers, json={}).status_code == 422
+    assert client.post("/api/sweets/batch/restock", headers=headers, json={"ids": [1], "amount": 0}).status_code == 422
+    response = client.post("/api/sweets/batch/update", headers=headers, json={"ids": [1], "changes": {}})
+    assert response.status_code == 400
+    user_headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    assert client.post("/api/sweets/batch/delete", headers=user_headers, json={"ids": [1]}).status_code == 403
+
+
+# ------------------ BULK IMPORT ------------------
+def test_import_sweets_csv(client: TestClient, admin_user):
+    tag = uuid.uuid4().hex[:8]
+    body = (
+        "name,category,price,quantity\n"
+        f"imp_{tag}_1,Import,2.5,10\n"
+        f"imp_{tag}_2,Import,-1,10\n"
+        f"imp_{tag}_3,Import,4,3\n"
+    )
+    response = client.post(
+        "/api/sweets/import?batch_size=1",
+        headers={"Authorization": f"Bearer {admin_user['token']}", "Content-Type": "text/csv"},
+        content=body,
+    )
+    assert response.status_code == 200
+    report = response.json()
+    assert report["rows"] == 3
+    assert report["written"] == 2
+    assert report["error_count"] == 1
+    assert report["errors"][0]["line"] == 3
+    assert "price" in report["errors"][0]["error"]
+
+    found = client.get(f"/api/sweets/search?name=imp_{tag}", headers={"Authorization": f"Bearer {admin_user['token']}"})
+    assert sorted(s["name"] for s in found.json()) == [f"imp_{tag}_1", f"imp_{tag}_3"]
+
+
+def test_import_sweets_ndjson_update_existing(client: TestClient, admin_user):
+    tag = uuid.uuid4().hex[:8]
+    headers = {"Authorization": f"Bearer {admin_user['token']}", "Content-Type": "application/x-ndjson"}
+    row = {"name": f"nd_{tag}", "category": "Import", "price": 1.0, "quantity": 1}
+
+    first = client.post("/api/sweets/import", headers=headers, content=json.dumps(row) + "\nnot json\n")
+    assert first.json()["written"] == 1
+    assert first.json()["error_count"] == 1
+
+    skipped = client.post("/api/sweets/import", headers=headers, content=json.dumps({**row, "quantity": 9}))
+    assert skipped.json()["written"] == 0
+
+    updated = client.post(
+        "/api/sweets/import?update_existing=true", headers=headers, content=json.dumps({**row, "quantity": 9})
+    )
+    assert updated.json()["written"] == 1
+
+    found = client.get(f"/api/sweets/search?name=nd_{tag}", headers={"Authorization": f"Bearer {admin_user['token']}"})
+    assert found.json()[0]["quantity"] == 9
+
+    # The ledger still adds up to the stock
+    movements = client.get(
+        f"/api/sweets/{found.json()[0]['id']}/movements", headers={"Authorization": f"Bearer {admin_user['token']}"}
+    ).json()
+    assert [(m["reason"], m["delta"]) for m in movements] == [("adjustment", 8), ("initial", 1)]
+    assert movements[0]["user_id"] == movements[1]["user_id"] is not None
+
+
+
+def test_import_failed_batch_keeps_earlier_batches_consistent(client: TestClient, admin_user, monkeypatch):
+    from app import bulk_import, catalog_cache
+    from app.suggest import suggest_index
+
+    real_write_batch, calls = bulk_import.write_batch, []
+
+    def failing_second_batch(conn, *args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+        return real_write_batch(conn, *args)
+
+    monkeypatch.setattr(bulk_import, "write_batch", failing_second_batch)
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    client.post("/api/ops/facets/rebuild", headers=headers)
+    suggest_index.ready = True
+    version = catalog_cache.catalog_version
+    tag = uuid.uuid4().hex[:8]
+    body = "name,category,price,quantity\n" + "".join(f"fail_{tag}_{i},Imp {tag},1,1\n" for i in range(3))
+
+    response = client.post("/api/sweets/import?batch_size=1", headers={**headers, "Content-Type": "text/csv"}, content=body)
+    assert response.status_code == 500
+    assert "line 3" in response.json()["detail"]
+    assert len(calls) == 2
+
+    # The committed first batch is fully reflected everywhere
+    assert catalog_cache.catalog_version > version
+    assert suggest_index.ready is False
+    assert client.get("/api/ops/facets/verify", headers=headers).json()["consistent"] is True
+    found = client.get(f"/api/sweets/search?name=fail_{tag}", headers=headers).json()
+    assert [s["name"] for s in found] == [f"fail_{tag}_0"]
+
+
+def test_import_ledger_only_covers_rows_written(client: TestClient, admin_user, db_session, monkeypatch):
+    from sqlalchemy import create_engine, text
+
+    from app import bulk_import
+    from app.db import engine
+
+    tag = uuid.uuid4().hex[:8]
+    existing = models.Sweet(name=f"race_{tag}", category="Import", price=1.0, quantity=5)
+    db_session.add(existing)
+    db_session.commit()
+
+    real_insert_batch = bulk_import._insert_batch
+
+    def purchase_lands_mid_batch(conn, rows, locked_ids):
+        # Another connection sells one unit while this batch is in flight
+        other = create_engine(engine.url)
+        with other.begin() as other_conn:
+            other_conn.execute(text("UPDATE sweets SET quantity = quantity - 1 WHERE id = :id"), {"id": existing.id})
+        other.dispose()
+        return real_insert_batch(conn, rows, locked_ids)
+
+    monkeypatch.setattr(bulk_import, "_insert_batch", purchase_lands_mid_batch)
+    headers = {"Authorization": f"Bearer {admin_user['token']}", "Content-Type": "application/x-ndjson"}
+    body = "\n".join(json.dumps({"name": name, "category": "Import", "price": 1.0, "quantity": 7})
+                     for name in (f"race_{tag}", f"race_{tag}_new"))
+    assert client.post("/api/sweets/import", headers=headers, content=body).json()["written"] == 1
+
+    # The skipped existing sweet gets no ledger row; the new one gets its initial stock
+    assert db_session.query(models.StockMovement).filter_by(sweet_id=existing.id).count() == 0
+    new_id = db_session.query(models.Sweet.id).filter_by(name=f"race_{tag}_new").scalar()
+    assert [(m.reason, m.delta) for m in db_session.query(models.StockMovement).filter_by(sweet_id=new_id)] == [
+        ("initial", 7)
+    ]
+
+# ------------------ EXPORT ------------------
+def test_export_sweets_ndjson_and_csv(client: TestClient, admin_user, db_session):
+    name = f"export_{uuid.uuid4().hex[:8]}"
+    db_session.add(models.Sweet(name=name, category="Export", price=7.5, quantity=4))
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {admin_user['token']}"}
+
+    response = client.get("/api/sweets/export", headers=headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == db_session.query(models.Sweet).count()
+    row = next(r for r in rows if r["name"] == name)
+    assert row == {"id": row["id"], "name": name, "category": "Export", "price": 7.5, "quantity": 4}
+
+    response = client.get("/api/sweets/export?format=csv", headers=headers)
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines[0] == "id,name,category,price,quantity"
+    assert f"{row['id']},{name},Export,7.5,4" in lines
+
+
+def test_export_sweets_admin_only(client: TestClient, normal_user):
+    response = client.get("/api/sweets/export", headers={"Authorization": f"Bearer {normal_user['token']}"})
+    assert response.status_code == 403
+
+
+# ------------------ STOCK HISTORY ------------------
+def test_stock_movements_recorded(client: TestClient, admin_user, normal_user):
+    admin_headers = {"Authorization": f"Bearer {admin_user['token']}"}
+    user_headers = {"Authorization": f"Bearer {normal_user['token']}"}
+    sweet = client.post(
+        "/api/sweets/",
+        headers=admin_headers,
+        json={"name": f"ledger_{uuid.uuid4().hex[:8]}", "category": "Ledger", "price": 1.0, "quantity": 3},
+    ).json()
+
+    client.post(f"/api/sweets/{sweet['id']}/purchase", headers=user_headers)
+    client.post("/api/sweets/checkout", headers=user_headers, json={"items": [{"sweet_id": sweet["id"], "quantity": 2}]})
+    client.post(f"/api/sweets/{sweet['id']}/purchase", headers=user_headers)  # sold out, not recorded
+    client.post(f"/api/sweets/{sweet['id']}/restock?amount=5", headers=admin_headers)
+    client.patch(f"/api/sweets/{sweet['id']}", headers=admin_headers, json={"quantity": 4})
+
+    response = client.get(f"/api/sweets/{sweet['id']}/movements", headers=admin_headers)
+    assert response.status_code == 200
+    movements = response.json()
+    assert [(m["reason"], m["delta"]) for m in movements] == [
+        ("adjustment", -1),
+        ("restock", 5),
+        ("purchase", -2),
+        ("purchase", -1),
+        ("initial", 3),
+    ]
+    assert sum(m["delta"] for m in movements) == 4
+
+    older = client.get(f"/api/sweets/{sweet['id']}/movements?before_id={movements[1]['id']}&limit=1", headers=admin_headers)
+    assert [m["reason"] for m in older.json()] == ["purchase"]